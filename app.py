@@ -1,5 +1,12 @@
-from app import app
+import os
+from app import app, start_background_tasks
+
+DEBUG = True
 
 if __name__ == "__main__":
+    # In debug mode the server runs in a child process of the reloader, so the
+    # background tasks are only started there
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_tasks()
     # Start the Flask server
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=DEBUG)
\ No newline at end of file
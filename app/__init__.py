@@ -1,5 +1,9 @@
+import os
+import threading
 from flask import Flask
+from .jobs import job_queue
 from .routes import routes_bp
+from .service import keep_pesquisaprotesto_session, warm_up
 
 def create_app():
     app = Flask(
@@ -10,7 +14,29 @@ def create_app():
 
     # Registrar blueprint do app principal
     app.register_blueprint(routes_bp)
-    
+
     return app
 
+def start_background_tasks():
+    """
+    Start the background work of the API server. Called by the server entry
+    point only, so the command-line tools importing this package stay passive.
+    """
+    # Resume the jobs left unfinished by a previous run. Without this, the
+    # queue still starts on the first job submitted.
+    job_queue.start()
+
+    # Start the browsers and the reCAPTCHA solver in the background instead of
+    # waiting for the first request that needs them
+    warm_up_browsers = int(os.getenv("WARM_UP_BROWSERS", 0))
+    if warm_up_browsers:
+        threading.Thread(target=warm_up, args=(warm_up_browsers,), daemon=True).start()
+
+    # Keep the pesquisaprotesto session logged in ahead of its expiry, when
+    # there are credentials to log in with
+    session_refresh_interval = float(os.getenv("PESQUISAPROTESTO_SESSION_REFRESH_INTERVAL", 300))
+    has_credentials = os.getenv("PESQUISAPROTESTO_USER") and os.getenv("PESQUISAPROTESTO_PASSWORD")
+    if session_refresh_interval and has_credentials:
+        threading.Thread(target=keep_pesquisaprotesto_session, args=(session_refresh_interval,), daemon=True).start()
+
 app = create_app()
\ No newline at end of file
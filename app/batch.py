@@ -0,0 +1,42 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+def iter_batch(func, items, workers=4):
+    """
+    Runs func over items with bounded concurrency and yields results as they complete.
+
+    Items are consumed lazily, so at most 'workers' calls are in flight at any
+    time and the input can be an arbitrarily large iterator. The calls run on
+    threads because the sources are blocking (requests and Selenium); the
+    per-source lanes and host limits of the service bound the upstream load.
+
+    Args:
+        func (callable): Function called with each item.
+        items (iterable): Items to process.
+        workers (int): Maximum number of concurrent calls.
+
+    Yields:
+        tuple: The item, its result (None on failure) and the raised exception (None on success).
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        pending = {}
+
+        def submit_next():
+            for item in items:
+                pending[executor.submit(func, item)] = item
+                return True
+            return False
+
+        for _ in range(workers):
+            if not submit_next():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+                submit_next()
@@ -0,0 +1,174 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from functools import wraps
+from .metrics import CACHE_LOOKUPS
+from .tracing import span
+
+# Cache file and limits
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE", "1") == "1"
+RESULT_CACHE_FILE = os.getenv("RESULT_CACHE_FILE", "result_cache.sqlite3")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 100000))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", 256))
+
+# Time to live of each source, in seconds. Registry data is stable for days,
+# protests and social media change more often.
+DAY = 24 * 60 * 60
+SOURCE_TTLS = {
+    "cnpj": float(os.getenv("CACHE_TTL_CNPJ", 7 * DAY)),
+    "protests": float(os.getenv("CACHE_TTL_PROTESTS", 1 * DAY)),
+    "government_contracts": float(os.getenv("CACHE_TTL_GOVERNMENT_CONTRACTS", 1 * DAY)),
+    "reputation": float(os.getenv("CACHE_TTL_REPUTATION", 3 * DAY)),
+    "instagram": float(os.getenv("CACHE_TTL_INSTAGRAM", 3 * DAY)),
+    "facebook": float(os.getenv("CACHE_TTL_FACEBOOK", 3 * DAY)),
+}
+
+class ResultCache:
+    """A persistent SQLite cache with per-source TTLs and LRU eviction."""
+
+    def __init__(self, path, ttls, max_entries, max_bytes):
+        self.path = path
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open the database on first use and create the table if needed."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (source, key)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, source, key):
+        """
+        Look up a cached result.
+
+        Returns:
+            tuple: Whether the key was found and the cached value.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM results WHERE source = ? AND key = ?",
+                (source, key),
+            ).fetchone()
+            if row is None:
+                return False, None
+            value, expires_at = row
+            if expires_at < now:
+                conn.execute("DELETE FROM results WHERE source = ? AND key = ?", (source, key))
+                conn.commit()
+                return False, None
+            conn.execute(
+                "UPDATE results SET last_access = ? WHERE source = ? AND key = ?",
+                (now, source, key),
+            )
+            conn.commit()
+        return True, pickle.loads(value)
+
+    def set(self, source, key, value):
+        """Store a result and evict the least recently used entries if over the limits."""
+        now = time.time()
+        blob = pickle.dumps(value)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (source, key, blob, len(blob), now + self.ttls.get(source, DAY), now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then the least recently used ones until under the size cap."""
+        conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess_count = max(count - self.max_entries, 0)
+        excess_bytes = max(total - self.max_bytes, 0)
+        cursor = conn.execute("SELECT source, key, size FROM results ORDER BY last_access")
+        victims = []
+        for source, key, size in cursor:
+            if excess_count <= 0 and excess_bytes <= 0:
+                break
+            victims.append((source, key))
+            excess_count -= 1
+            excess_bytes -= size
+        conn.executemany("DELETE FROM results WHERE source = ? AND key = ?", victims)
+
+    def clear(self, source=None):
+        """Remove every entry, or only those of a given source."""
+        with self._lock:
+            conn = self._connect()
+            if source is None:
+                conn.execute("DELETE FROM results")
+            else:
+                conn.execute("DELETE FROM results WHERE source = ?", (source,))
+            conn.commit()
+
+result_cache = ResultCache(
+    RESULT_CACHE_FILE,
+    SOURCE_TTLS,
+    RESULT_CACHE_MAX_ENTRIES,
+    int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+)
+
+def cached(source, should_cache=None):
+    """
+    Cache the results of a fetch function under the given source.
+
+    The wrapped function accepts an extra 'refresh' keyword argument; when true
+    the cached value is ignored and replaced by a fresh result.
+
+    Args:
+        source (str): Name of the source, used to select its TTL.
+        should_cache (callable): Predicate telling whether a result is worth
+            storing, so that errors and empty results are not cached.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, refresh=False, **kwargs):
+            if not RESULT_CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            key = json.dumps([args, kwargs], sort_keys=True, default=str)
+            if not refresh:
+                with span(f"cache {source}") as attributes:
+                    hit, value = result_cache.get(source, key)
+                    attributes["result"] = "hit" if hit else "miss"
+                CACHE_LOOKUPS.inc(source=source, result="hit" if hit else "miss")
+                if hit:
+                    return value
+
+            value = func(*args, **kwargs)
+            if should_cache is None or should_cache(value):
+                result_cache.set(source, key, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+from .scoring import parse_followers
+
+# Results are written with the CNPJ as the first key, so the resume index can
+# read it without parsing the whole line
+CNPJ_PREFIX = re.compile(r'^\{"cnpj": "([^"]*)"')
+
+# Column types of the columnar (Parquet) results. Repeated labels are stored
+# as categoricals, counts as nullable integers and amounts as floats, so no
+# column falls back to the object dtype.
+RESULT_DTYPES = {
+    "cnpj": "string",
+    "name": "string",
+    "state": "category",
+    "status": "category",
+    "last_update": "string",
+    "type": "category",
+    "registration_status": "category",
+    "main_activity_code": "category",
+    "main_activity": "category",
+    "size": "category",
+    "social_capital": "float64",
+    "protests": "Int64",
+    "protested_value": "float64",
+    "government_contracts": "boolean",
+    "instagram_url": "string",
+    "instagram_followers": "Int64",
+    "facebook_url": "string",
+    "facebook_followers": "Int64",
+    "score": "Int64",
+    "risk_band": "category",
+    "sources": "string",
+}
+
+def _json_default(value):
+    """Serialize NumPy scalars found in the results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+class CheckpointStore:
+    """
+    Append-only JSONL store of batch results.
+
+    Each result is appended and flushed as soon as it completes, so a run can
+    be interrupted at any point without rewriting what is already saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, result):
+        """Append a single result."""
+        record = {"cnpj": str(result["cnpj"])}
+        record.update((key, value) for key, value in result.items() if key != "cnpj")
+        line = json.dumps(record, default=_json_default, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def extend(self, results):
+        """Append several results, e.g. when seeding from a previous export."""
+        for result in results:
+            self.append(result)
+
+    def processed_keys(self):
+        """Return the set of CNPJs already saved, reading only the key of each line."""
+        keys = set()
+        if not self.exists():
+            return keys
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                match = CNPJ_PREFIX.match(line)
+                if match:
+                    keys.add(match.group(1))
+                    continue
+                try:
+                    keys.add(str(json.loads(line)["cnpj"]))
+                except (ValueError, KeyError):
+                    # Ignore a line left incomplete by an interrupted run
+                    continue
+        return keys
+
+    def read_frame(self):
+        """Load every saved result into a DataFrame."""
+        records = []
+        if self.exists():
+            with open(self.path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        df = pd.DataFrame(records)
+        if "cnpj" in df:
+            df["cnpj"] = df["cnpj"].astype(str)
+        return df
+
+    def export_parquet(self, path):
+        """
+        Write the saved results to a Parquet file with the typed schema.
+
+        Results already in the file are kept unless a newer result of the same
+        CNPJ was saved, so the file accumulates the results of every run.
+        """
+        df = typed_frame(self.read_frame())
+        if os.path.exists(path):
+            previous = pd.read_parquet(path)
+            previous = previous[~previous["cnpj"].isin(df["cnpj"])] if "cnpj" in df else previous
+            df = typed_frame(pd.concat([previous.astype(object), df.astype(object)], ignore_index=True))
+        temp_path = f"{path}.tmp"
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+        return len(df)
+
+    def export_excel(self, path):
+        """Write every saved result to an Excel file."""
+        df = self.read_frame()
+        # Nested per-source reports are kept as JSON text in a single cell
+        if "sources" in df:
+            df["sources"] = df["sources"].map(
+                lambda value: json.dumps(value) if isinstance(value, dict) else value
+            )
+        df.to_excel(path, index=False)
+        return len(df)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def typed_frame(df):
+    """Convert a results table to the column types of RESULT_DTYPES."""
+    df = df.copy()
+    for column, dtype in RESULT_DTYPES.items():
+        if column not in df:
+            continue
+        values = df[column]
+        if column == "sources":
+            values = values.map(lambda value: json.dumps(value) if isinstance(value, dict) else value)
+        elif column.endswith("_followers"):
+            # Facebook reports abbreviated counts such as '1,2 mil'
+            values = parse_followers(values).round()
+        elif dtype in ("Int64", "float64"):
+            values = pd.to_numeric(values, errors="coerce")
+        elif dtype == "boolean":
+            values = values.map({True: True, False: False, "True": True, "False": False})
+        elif dtype == "string":
+            values = values.where(values.notna(), None)
+        df[column] = values.astype(dtype)
+    return df
+
+def read_results(path, columns=None):
+    """
+    Read a results table saved as Parquet, JSONL, Excel or CSV.
+
+    Args:
+        path (str): Path of the results file.
+        columns (list): Columns to load. Parquet files only read these columns
+            from disk, e.g. just 'cnpj' to resume a run.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    if path.endswith(".jsonl"):
+        df = pd.read_json(path, lines=True, dtype={"cnpj": str})
+        return df[columns] if columns else df
+    if path.endswith((".xlsx", ".xls")):
+        return pd.read_excel(path, dtype={"cnpj": str}, usecols=columns)
+    return pd.read_csv(path, dtype={"cnpj": str}, usecols=columns)
@@ -1,28 +1,37 @@
+from contextlib import contextmanager
 import os
+import queue
 import random
+import threading
 import time
+from .metrics import DRIVER_RESTARTS
+from .tracing import span, trace_driver
 from .utils import (
     initialize_driver,
     load_cookies,
     prompt_login,
     save_cookies,
+    ensure_chromedriver,
     get_chrome_version,
-    get_chromedriver_url,
-    update_chromedriver,
 )
 
 class DriverManager:
-    def __init__(self, instagram_url, cookies_file):
+    def __init__(self, instagram_url, cookies_file, driver_path=None, profile="default", save_cookies=True):
         self.driver = None
+        self.profile = profile
+        self.save_cookies = save_cookies
+        self.uses = 0
         self.instagram_cookies_file = cookies_file
         self.instagram_url = instagram_url
-        self.chrome_version = get_chrome_version()
-        update_chromedriver(get_chromedriver_url(self.chrome_version))
+        if driver_path is None:
+            driver_path = ensure_chromedriver(get_chrome_version())
+        self.driver_path = driver_path
         self._setup_driver()
 
     def _setup_driver(self):
         """Initialize and set up the WebDriver."""
-        self.driver = initialize_driver()
+        with span("driver_start", profile=self.profile):
+            self.driver = trace_driver(initialize_driver(self.driver_path, self.profile))
         if os.path.exists(self.instagram_cookies_file):
             while True:
                 try:
@@ -45,16 +54,162 @@ class DriverManager:
     def restart_driver(self):
         """Restart the WebDriver with a random delay."""
         if self.driver:
-            self.driver.get(self.instagram_url)
-            save_cookies(self.driver, self.instagram_cookies_file)
+            if self.save_cookies:
+                self.driver.get(self.instagram_url)
+                save_cookies(self.driver, self.instagram_cookies_file)
             self.driver.quit()
             random_sleep = int(random.uniform(30, 90))
             print(f"Driver stopped, waiting {random_sleep} seconds to restart...")
             time.sleep(random_sleep)
         # Reinitialize the driver
+        DRIVER_RESTARTS.inc(reason="restart")
         self._setup_driver()
         print("Driver restarted successfully!")
 
     def get_driver(self):
         """Return the active WebDriver instance."""
-        return self.driver
\ No newline at end of file
+        return self.driver
+
+    def is_healthy(self):
+        """Check whether the browser still answers commands."""
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def close(self, save_session=True):
+        """Save the Instagram cookies and quit the WebDriver."""
+        if self.driver:
+            try:
+                if save_session and self.save_cookies:
+                    self.driver.get(self.instagram_url)
+                    save_cookies(self.driver, self.instagram_cookies_file)
+            except Exception as e:
+                print(f"Error saving session before closing driver: {e}")
+            finally:
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+                self.driver = None
+
+class DriverPoolTimeout(TimeoutError):
+    """Raised when no driver becomes available within the pool's max wait."""
+
+class DriverPool:
+    """
+    A bounded pool of headless drivers with checkout/checkin semantics.
+
+    Each checked out DriverManager is used by a single thread at a time, so
+    concurrent requests never share page state. Drivers are created lazily,
+    health-checked on checkout and recycled after a number of uses.
+
+    Only the pool serving Instagram (save_cookies) saves the Instagram
+    cookies when it closes a driver.
+    """
+
+    def __init__(self, instagram_url, cookies_file, size=2, max_uses=50, max_wait=120, profile="default", save_cookies=True):
+        self.instagram_url = instagram_url
+        self.profile = profile
+        self.save_cookies = save_cookies
+        self.instagram_cookies_file = cookies_file
+        self.size = size
+        self.max_uses = max_uses
+        self.max_wait = max_wait
+        self.chrome_version = get_chrome_version()
+        self.driver_path = ensure_chromedriver(self.chrome_version)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        # Drivers are started one at a time, since a first run may prompt for the Instagram login
+        self._setup_lock = threading.Lock()
+
+    def _new_manager(self):
+        with self._setup_lock:
+            return DriverManager(
+                self.instagram_url,
+                self.instagram_cookies_file,
+                driver_path=self.driver_path,
+                profile=self.profile,
+                save_cookies=self.save_cookies,
+            )
+
+    def checkout(self, timeout=None):
+        """
+        Take a driver from the pool, starting a new one if none is idle.
+
+        Args:
+            timeout (float): Maximum wait for a free slot. Defaults to the pool's max_wait.
+
+        Raises:
+            DriverPoolTimeout: If every driver stays busy for the whole wait.
+        """
+        timeout = self.max_wait if timeout is None else timeout
+        with span("driver_checkout_wait", profile=self.profile):
+            acquired = self._slots.acquire(timeout=timeout)
+        if not acquired:
+            raise DriverPoolTimeout(f"No browser available after {timeout} seconds.")
+        try:
+            try:
+                manager = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_manager()
+            if not manager.is_healthy():
+                print("Unhealthy driver found in the pool, replacing it...")
+                DRIVER_RESTARTS.inc(reason="unhealthy")
+                manager.close(save_session=False)
+                return self._new_manager()
+            return manager
+        except Exception:
+            self._slots.release()
+            raise
+
+    def checkin(self, manager, discard=False):
+        """
+        Return a driver to the pool, recycling it once it reaches max_uses.
+
+        A recycled driver is closed in the background, so the caller does not
+        wait for it; its slot is freed once the browser has quit.
+        """
+        manager.uses += 1
+        if discard or manager.uses >= self.max_uses:
+            DRIVER_RESTARTS.inc(reason="recycled")
+            threading.Thread(target=self._close, args=(manager,), daemon=True, name="driver-recycle").start()
+        else:
+            self._idle.put(manager)
+            self._slots.release()
+
+    def _close(self, manager):
+        try:
+            manager.close()
+        finally:
+            self._slots.release()
+
+    def warm_up(self, count=1):
+        """Start up to 'count' drivers ahead of the first checkout."""
+        managers = []
+        try:
+            for _ in range(min(count, self.size)):
+                managers.append(self.checkout())
+        finally:
+            for manager in managers:
+                self._idle.put(manager)
+                self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Check out a DriverManager for the duration of a with block."""
+        manager = self.checkout(timeout)
+        try:
+            yield manager
+        finally:
+            self.checkin(manager)
+
+    def close(self):
+        """Quit every idle driver."""
+        while True:
+            try:
+                manager = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            manager.close()
@@ -0,0 +1,86 @@
+import random
+import numpy as np
+import pandas as pd
+from .utils import is_valid_cnpj
+
+class CnpjSet:
+    """
+    A compact set of CNPJs, stored as a sorted int64 array.
+
+    The two check digits are derived from the other twelve, so each CNPJ is
+    kept as its 12-digit base: 8 bytes per entry instead of a Python string.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add_new(self, cnpjs):
+        """
+        Add a chunk of normalized CNPJs and return a mask of those not seen before.
+
+        Repeated CNPJs within the chunk are flagged only on their first occurrence.
+        """
+        keys = np.fromiter((int(cnpj[:12]) for cnpj in cnpjs), dtype=np.int64, count=len(cnpjs))
+        _, first = np.unique(keys, return_index=True)
+        is_first = np.zeros(len(keys), dtype=bool)
+        is_first[first] = True
+        mask = is_first & ~np.isin(keys, self.keys)
+        self.keys = np.union1d(self.keys, keys[mask])
+        return mask
+
+def iter_cnpjs(path, column="CNPJ", chunksize=100000, skip=None, shuffle_buffer=10000, stats=None, sep=";", encoding="latin1"):
+    """
+    Stream the CNPJs of a large CSV file, normalized, validated and deduplicated.
+
+    Only the CNPJ column is read, one chunk at a time, so processing can start
+    immediately and memory stays flat regardless of the file size.
+
+    Args:
+        path (str): Path of the CSV file.
+        column (str): Name of the CNPJ column.
+        chunksize (int): Rows read per chunk.
+        skip (set): CNPJs to leave out, e.g. those already processed.
+        shuffle_buffer (int): Size of the buffer used to shuffle the output
+            (0 keeps the file order).
+        stats (dict): Optional dict updated with the 'read', 'invalid' and 'duplicates' counts.
+
+    Yields:
+        str: Normalized 14-digit CNPJs.
+    """
+    skip = skip or set()
+    stats = stats if stats is not None else {}
+    stats.update(read=0, invalid=0, duplicates=0)
+    seen = CnpjSet()
+    buffer = []
+
+    chunks = pd.read_csv(path, sep=sep, encoding=encoding, dtype=str, usecols=[column], chunksize=chunksize)
+    for chunk in chunks:
+        values = chunk[column].dropna().str.replace(r"\D", "", regex=True).str.zfill(14)
+        stats["read"] += len(chunk)
+
+        valid = values[values.map(is_valid_cnpj)].tolist()
+        stats["invalid"] += len(chunk) - len(valid)
+
+        new = seen.add_new(valid) if valid else []
+        for cnpj, is_new in zip(valid, new):
+            if not is_new:
+                stats["duplicates"] += 1
+                continue
+            if cnpj in skip:
+                continue
+            if not shuffle_buffer:
+                yield cnpj
+                continue
+            # Emit a random buffered CNPJ once the buffer is full
+            if len(buffer) < shuffle_buffer:
+                buffer.append(cnpj)
+            else:
+                index = random.randrange(shuffle_buffer)
+                yield buffer[index]
+                buffer[index] = cnpj
+
+    random.shuffle(buffer)
+    yield from buffer
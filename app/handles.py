@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import time
+from .utils import normalize_cnpj
+
+# Index of the social media and Reclame Aqui handles resolved for each CNPJ
+HANDLE_INDEX_ENABLED = os.getenv("HANDLE_INDEX", "1") == "1"
+HANDLE_INDEX_FILE = os.getenv("HANDLE_INDEX_FILE", "handles.sqlite3")
+
+# Resolved handles rarely change; a handle found missing is retried sooner,
+# since the company may create the page in the meantime
+DAY = 24 * 60 * 60
+HANDLE_TTL = float(os.getenv("HANDLE_TTL", 90 * DAY))
+HANDLE_NEGATIVE_TTL = float(os.getenv("HANDLE_NEGATIVE_TTL", 7 * DAY))
+
+class HandleIndex:
+    """
+    A persistent SQLite index of the handle that resolved for each CNPJ and network.
+
+    A missing page is recorded as a negative entry (a NULL handle), so repeat
+    assessments skip both the guessed URLs that work and those that do not.
+    """
+
+    def __init__(self, path, ttl, negative_ttl):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open the database on first use and create the table if needed."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS handles (
+                    cnpj TEXT NOT NULL,
+                    network TEXT NOT NULL,
+                    handle TEXT,
+                    resolved_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (cnpj, network)
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, cnpj, network):
+        """
+        Look up the handle of a CNPJ on a network.
+
+        Returns:
+            tuple: Whether an unexpired entry was found, and the handle (None
+                when the page is known not to exist).
+        """
+        if not HANDLE_INDEX_ENABLED or not cnpj:
+            return False, None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT handle, expires_at FROM handles WHERE cnpj = ? AND network = ?",
+                (normalize_cnpj(cnpj), network),
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, row[0]
+
+    def set(self, cnpj, network, handle):
+        """Record the handle that resolved for a CNPJ, or None if no page was found."""
+        if not HANDLE_INDEX_ENABLED or not cnpj:
+            return
+        now = time.time()
+        ttl = self.ttl if handle is not None else self.negative_ttl
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO handles VALUES (?, ?, ?, ?, ?)",
+                (normalize_cnpj(cnpj), network, handle, now, now + ttl),
+            )
+            conn.commit()
+
+handle_index = HandleIndex(HANDLE_INDEX_FILE, HANDLE_TTL, HANDLE_NEGATIVE_TTL)
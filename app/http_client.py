@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import os
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from .limits import rate_limiter
+from .tracing import span
+
+# Connection pool and timeouts of the shared HTTP session. The pool is sized
+# to the number of threads that may call the REST-backed sources at once.
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", os.getenv("SOURCE_WORKERS", 8)))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+
+# Retries of a request answered with HTTP 429, and the wait used when the
+# response has no Retry-After header
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 5))
+DEFAULT_RETRY_AFTER = 30
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the shared requests.Session, creating it on first use.
+
+    The session keeps connections alive between calls, so repeated requests to
+    the same host reuse the TCP+TLS connection instead of paying a new handshake.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # Responses are decompressed transparently by requests
+                session.headers.update({
+                    "Accept-Encoding": "gzip, deflate",
+                    "Connection": "keep-alive",
+                })
+                _session = session
+    return _session
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+def get(url, **kwargs):
+    """
+    Send a GET request through the shared session.
+
+    A (connect, read) timeout is applied unless one is given, so a hung
+    upstream cannot block the calling thread forever. Every request waits for
+    the host's token bucket, and an HTTP 429 holds back all callers of that
+    host for the Retry-After period before the request is retried.
+    """
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    host = urlparse(url).hostname
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        with span("rate_limit_wait", host=host):
+            rate_limiter.acquire(host)
+        with span("http GET", host=host) as attributes:
+            response = get_session().get(url, **kwargs)
+            attributes["status"] = response.status_code
+        if response.status_code != 429 or attempt == HTTP_MAX_RETRIES:
+            return response
+        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+        print(f"Rate limited by {host}, waiting {retry_after:.0f} seconds before retrying...")
+        rate_limiter.penalize(host, retry_after)
+        response.close()
+
+def post(url, **kwargs):
+    """Send a POST request through the shared session, with the default timeout."""
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    host = urlparse(url).hostname
+    with span("rate_limit_wait", host=host):
+        rate_limiter.acquire(host)
+    with span("http POST", host=host) as attributes:
+        response = get_session().post(url, **kwargs)
+        attributes["status"] = response.status_code
+    return response
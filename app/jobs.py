@@ -0,0 +1,232 @@
+"""
+Asynchronous assessment jobs.
+
+A job holds one or many CNPJs. It is persisted in a local SQLite queue and
+processed by an in-process worker pool, so a slow assessment never holds an
+HTTP request open. Partial results are stored as each source completes, and
+an optional callback URL receives the job once every CNPJ is done. Jobs left
+unfinished by a restart are queued again on startup.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from . import http_client
+from .service import fetch_company_data
+
+JOBS_DB_FILE = os.getenv("JOBS_DB_FILE", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Maximum number of CNPJs accepted in a single job
+JOB_MAX_CNPJS = int(os.getenv("JOB_MAX_CNPJS", 1000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    callback_url TEXT,
+    refresh INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    cnpj TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+def _dumps(value):
+    return json.dumps(value, default=str)
+
+class JobQueue:
+    """A persistent queue of assessment jobs, processed by a pool of worker threads."""
+
+    def __init__(self, db_path=JOBS_DB_FILE, workers=JOB_WORKERS):
+        self.db_path = db_path
+        self.workers = workers
+        self._conn = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._threads = []
+
+    def _connect(self):
+        """Open the database on first use and create the tables if needed."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+        return rows
+
+    def start(self):
+        """Start the workers, queuing again the items left unfinished by a previous run."""
+        with self._lock:
+            if self._threads:
+                return
+            conn = self._connect()
+            pending = conn.execute(
+                "SELECT job_id, position, cnpj FROM job_items WHERE status IN ('queued', 'running') ORDER BY rowid"
+            ).fetchall()
+            conn.execute("UPDATE job_items SET status = 'queued' WHERE status = 'running'")
+            conn.commit()
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, daemon=True, name="job-worker")
+                thread.start()
+                self._threads.append(thread)
+        if pending:
+            print(f"Resuming {len(pending)} unfinished job items.")
+        for item in pending:
+            self._queue.put(item)
+
+    def submit(self, cnpjs, callback_url=None, refresh=False):
+        """
+        Enqueue the assessment of one or many CNPJs.
+
+        Args:
+            cnpjs (list): CNPJs to assess.
+            callback_url (str): URL receiving a POST with the job once it finishes.
+            refresh (bool): Ignore cached results and fetch every source again.
+
+        Returns:
+            str: The job ID.
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, callback_url, int(refresh), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO job_items VALUES (?, ?, ?, 'queued', '{}', NULL, NULL)",
+                [(job_id, position, cnpj) for position, cnpj in enumerate(cnpjs)],
+            )
+            conn.commit()
+        for position, cnpj in enumerate(cnpjs):
+            self._queue.put((job_id, position, cnpj))
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return the status of a job and the results gathered so far.
+
+        Returns:
+            dict: The job, or None if it does not exist.
+        """
+        job = self._execute(
+            "SELECT status, callback_url, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not job:
+            return None
+        status, callback_url, created_at, updated_at = job[0]
+        items = self._execute(
+            "SELECT cnpj, status, sources, result, error FROM job_items WHERE job_id = ? ORDER BY position",
+            (job_id,),
+        )
+        results = []
+        for cnpj, item_status, sources, result, error in items:
+            entry = {"cnpj": cnpj, "status": item_status, "sources": json.loads(sources)}
+            if result is not None:
+                entry["result"] = json.loads(result)
+            if error is not None:
+                entry["error"] = error
+            results.append(entry)
+        return {
+            "job_id": job_id,
+            "status": status,
+            "callback_url": callback_url,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "completed": sum(1 for item in results if item["status"] in ("done", "error")),
+            "total": len(results),
+            "results": results,
+        }
+
+    def _update_job(self, job_id, status):
+        self._execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def _work(self):
+        while True:
+            job_id, position, cnpj = self._queue.get()
+            try:
+                self._process(job_id, position, cnpj)
+            except Exception as e:
+                print(f"Error processing job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job_id, position, cnpj):
+        refresh = self._execute("SELECT refresh FROM jobs WHERE id = ?", (job_id,))[0][0]
+        self._execute(
+            "UPDATE job_items SET status = 'running' WHERE job_id = ? AND position = ?", (job_id, position)
+        )
+        self._update_job(job_id, "running")
+
+        partial = {}
+
+        def on_source_complete(name, value, report):
+            # Partial results are visible while the slower sources are still running
+            partial[name] = {"value": value, **report}
+            self._execute(
+                "UPDATE job_items SET sources = ? WHERE job_id = ? AND position = ?",
+                (_dumps(partial), job_id, position),
+            )
+
+        try:
+            result = fetch_company_data(cnpj, refresh=bool(refresh), on_source_complete=on_source_complete)
+            self._execute(
+                "UPDATE job_items SET status = 'done', result = ? WHERE job_id = ? AND position = ?",
+                (_dumps(result), job_id, position),
+            )
+        except Exception as e:
+            self._execute(
+                "UPDATE job_items SET status = 'error', error = ? WHERE job_id = ? AND position = ?",
+                (str(e), job_id, position),
+            )
+
+        remaining = self._execute(
+            "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN ('queued', 'running')", (job_id,)
+        )[0][0]
+        if remaining == 0:
+            self._finish(job_id)
+
+    def _finish(self, job_id):
+        """Mark a job as done and notify its callback URL, if any."""
+        with self._lock:
+            conn = self._connect()
+            # Only the worker that flips the status sends the callback
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ? AND status != 'done'",
+                (time.time(), job_id),
+            ).rowcount
+            conn.commit()
+        if not updated:
+            return
+        job = self.get(job_id)
+        if job["callback_url"]:
+            try:
+                http_client.post(
+                    job["callback_url"],
+                    data=_dumps(job),
+                    headers={"Content-Type": "application/json"},
+                )
+            except Exception as e:
+                print(f"Error sending the callback of job {job_id}: {e}")
+
+job_queue = JobQueue()
@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from functools import wraps
+import os
+import threading
+import time
+from .tracing import span
+
+# Maximum concurrent calls per upstream host. Can be overridden with
+# HOST_CONCURRENCY, e.g. "www.receitaws.com.br=1,www.instagram.com=4".
+DEFAULT_HOST_CONCURRENCY = {
+    "www.receitaws.com.br": 2,
+    "api.portaldatransparencia.gov.br": 4,
+    "www.pesquisaprotesto.com.br": 2,
+    "www.reclameaqui.com.br": 2,
+    "www.instagram.com": 2,
+    "www.facebook.com": 2,
+}
+
+# Request quotas per upstream host, as (requests, period in seconds). Can be
+# overridden with RATE_LIMITS, e.g. "www.receitaws.com.br=3/60".
+DEFAULT_RATE_LIMITS = {
+    "www.receitaws.com.br": (3, 60),
+    "api.portaldatransparencia.gov.br": (90, 60),
+}
+
+def parse_host_limits(value):
+    """Parse a 'host=limit,host=limit' string into a dict."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        host, _, limit = item.partition("=")
+        limits[host.strip()] = int(limit)
+    return limits
+
+def parse_rate_limits(value):
+    """Parse a 'host=requests/seconds,...' string into a dict."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        host, _, quota = item.partition("=")
+        requests, _, period = quota.partition("/")
+        limits[host.strip()] = (int(requests), float(period or 1))
+    return limits
+
+class HostLimiter:
+    """Caps the number of concurrent calls to each upstream host."""
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._held = threading.local()
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = self.limits.get(host)
+                self._semaphores[host] = threading.BoundedSemaphore(limit) if limit else None
+            return self._semaphores[host]
+
+    @contextmanager
+    def limit(self, host):
+        """
+        Hold one of the host's slots for the duration of a with block.
+
+        Nested calls from the same thread (e.g. retries) reuse the slot already held.
+        """
+        semaphore = self._semaphore(host)
+        held = self._held.__dict__.setdefault("hosts", set())
+        if semaphore is None or host in held:
+            yield
+            return
+        with span("host_slot_wait", host=host):
+            semaphore.acquire()
+        held.add(host)
+        try:
+            yield
+        finally:
+            held.discard(host)
+            semaphore.release()
+
+host_limiter = HostLimiter({
+    **DEFAULT_HOST_CONCURRENCY,
+    **parse_host_limits(os.getenv("HOST_CONCURRENCY", "")),
+})
+
+def limited(host):
+    """Decorate a function so that its calls count against the host's concurrency limit."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with host_limiter.limit(host):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class TokenBucket:
+    """
+    A token bucket shared by every caller of a host.
+
+    Tokens refill at 'rate' per second up to 'capacity'. A penalty (e.g. from
+    an HTTP 429 Retry-After) blocks the bucket for everyone until the penalty
+    expires. A bucket without a rate only enforces penalties.
+    """
+
+    def __init__(self, rate=None, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token if possible, otherwise return how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                return self.blocked_until - now
+            if self.rate is None:
+                return 0
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Block the bucket for the given number of seconds, then let a single request through."""
+        with self._lock:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = min(self.capacity, 1)
+            self.updated = self.blocked_until
+
+class RateLimiter:
+    """Keeps one token bucket per upstream host."""
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                if host in self.limits:
+                    requests, period = self.limits[host]
+                    self._buckets[host] = TokenBucket(rate=requests / period, capacity=requests)
+                else:
+                    self._buckets[host] = TokenBucket()
+            return self._buckets[host]
+
+    def acquire(self, host):
+        """Wait for the host's quota before sending a request."""
+        self.bucket(host).acquire()
+
+    def penalize(self, host, seconds):
+        """Hold back every caller of the host, e.g. after an HTTP 429."""
+        self.bucket(host).penalize(seconds)
+
+rate_limiter = RateLimiter({
+    **DEFAULT_RATE_LIMITS,
+    **parse_rate_limits(os.getenv("RATE_LIMITS", "")),
+})
@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+from .tracing import span
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+METRIC_PREFIX = "credit_assessment_"
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+class Counter:
+    """A monotonically increasing counter, split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = METRIC_PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+class Histogram:
+    """A latency histogram with cumulative buckets, split by labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = METRIC_PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, {"le": bound})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+FETCH_SECONDS = Histogram("fetch_duration_seconds", "Duration of the fetch_* calls.", ["source"])
+FETCH_TOTAL = Counter("fetch_total", "Outcomes of the fetch_* calls.", ["source", "outcome"])
+PAGE_LOAD_SECONDS = Histogram("page_load_duration_seconds", "Duration of the Selenium page loads.", ["source"])
+PAGE_LOAD_ERRORS = Counter("page_load_errors_total", "Selenium page loads that raised an error.", ["source"])
+DRIVER_RESTARTS = Counter("driver_restarts_total", "Browser restarts, by reason.", ["reason"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Result cache lookups, by result.", ["source", "result"])
+COALESCED_CALLS = Counter("coalesced_calls_total", "Calls that joined an identical call already in flight.", ["source"])
+
+METRICS = [
+    FETCH_SECONDS, FETCH_TOTAL, PAGE_LOAD_SECONDS, PAGE_LOAD_ERRORS,
+    DRIVER_RESTARTS, CACHE_LOOKUPS, COALESCED_CALLS,
+]
+
+def render():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Outcome of the fetch call running on each thread. The fetch functions swallow
+# their exceptions, so they report not-found/timeout/error results explicitly.
+_calls = threading.local()
+
+def mark_outcome(outcome):
+    """Record the outcome ('not_found', 'timeout' or 'error') of the current fetch call."""
+    stack = getattr(_calls, "stack", None)
+    if stack:
+        stack[-1] = outcome
+
+def outcome_for(exception):
+    """Classify an exception as a 'timeout' or an 'error'."""
+    if isinstance(exception, TimeoutError) or "Timeout" in type(exception).__name__:
+        return "timeout"
+    return "error"
+
+def instrument(source):
+    """Time a fetch function and count its outcomes under the given source."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = _calls.__dict__.setdefault("stack", [])
+            stack.append("success")
+            start = time.monotonic()
+            with span(f"fetch {source}") as attributes:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    stack[-1] = outcome_for(e)
+                    raise
+                finally:
+                    FETCH_SECONDS.observe(time.monotonic() - start, source=source)
+                    attributes["outcome"] = stack.pop()
+                    FETCH_TOTAL.inc(source=source, outcome=attributes["outcome"])
+            return result
+        return wrapper
+    return decorator
+
+@contextmanager
+def timed_page_load(source):
+    """Time a Selenium page load."""
+    start = time.monotonic()
+    try:
+        with span("page_load", source=source):
+            yield
+    except Exception:
+        PAGE_LOAD_ERRORS.inc(source=source)
+        raise
+    finally:
+        PAGE_LOAD_SECONDS.observe(time.monotonic() - start, source=source)
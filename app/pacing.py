@@ -0,0 +1,48 @@
+import os
+import random
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from .tracing import span
+
+# Total deliberate delay, in seconds, spent over one protest search session.
+# Waits are driven by DOM readiness conditions; this budget only adds a small,
+# human-like jitter on top of them and can be set to 0 to disable it.
+PESQUISAPROTESTO_DELAY_BUDGET = float(os.getenv("PESQUISAPROTESTO_DELAY_BUDGET", 3))
+PESQUISAPROTESTO_WAIT_TIMEOUT = float(os.getenv("PESQUISAPROTESTO_WAIT_TIMEOUT", 10))
+
+class PacingPolicy:
+    """
+    Pacing of a browser session: condition-driven waits plus a capped delay budget.
+
+    Each call to pause() spends a random share of the remaining budget, so the
+    total sleeping time of a session never exceeds the budget however many
+    actions it performs.
+    """
+
+    def __init__(self, budget=PESQUISAPROTESTO_DELAY_BUDGET, timeout=PESQUISAPROTESTO_WAIT_TIMEOUT):
+        self.budget = max(budget, 0)
+        self.timeout = timeout
+        self.spent = 0.0
+
+    @property
+    def remaining(self):
+        return max(self.budget - self.spent, 0)
+
+    def pause(self, share=0.25):
+        """Sleep for a random fraction of 'share' of the remaining budget."""
+        delay = random.uniform(0, self.remaining * share)
+        if delay > 0:
+            with span("pause", delay=round(delay, 3)):
+                time.sleep(delay)
+            self.spent += delay
+
+    def wait(self, driver, timeout=None):
+        """Return a WebDriverWait using the policy's default timeout."""
+        return WebDriverWait(driver, timeout or self.timeout, poll_frequency=0.2)
+
+    def wait_until_ready(self, driver, timeout=None):
+        """Wait until the document has finished loading."""
+        with span("wait_until_ready"):
+            self.wait(driver, timeout).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
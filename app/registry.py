@@ -0,0 +1,241 @@
+"""
+Local CNPJ registry built from the Receita Federal open-data dumps.
+
+The dumps (https://dadosabertos.rfb.gov.br/CNPJ/) are ingested into an indexed
+SQLite file, and lookups return the same dict shape as the ReceitaWS API, so
+fetch_cnpj_data can use either backend transparently.
+
+Usage:
+    python -m app.registry ingest <dump_dir> [--db registry.sqlite3] [--snapshot-date 2024-02-10]
+"""
+import argparse
+import csv
+import glob
+import io
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from datetime import date, datetime
+
+REGISTRY_DB_FILE = os.getenv("REGISTRY_DB_FILE", "registry.sqlite3")
+
+# Rows inserted per transaction while ingesting
+INGEST_BATCH_SIZE = 50000
+
+# Code tables of the open-data layout, mapped to the values used by ReceitaWS
+SITUACOES = {"01": "NULA", "02": "ATIVA", "03": "SUSPENSA", "04": "INAPTA", "08": "BAIXADA"}
+PORTES = {"00": "NAO INFORMADO", "01": "MICRO EMPRESA", "03": "EMPRESA DE PEQUENO PORTE", "05": "DEMAIS"}
+TIPOS = {"1": "MATRIZ", "2": "FILIAL"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS empresas (
+    cnpj_basico TEXT PRIMARY KEY,
+    razao_social TEXT,
+    capital_social TEXT,
+    porte TEXT
+);
+CREATE TABLE IF NOT EXISTS estabelecimentos (
+    cnpj TEXT PRIMARY KEY,
+    cnpj_basico TEXT NOT NULL,
+    matriz_filial TEXT,
+    nome_fantasia TEXT,
+    situacao TEXT,
+    data_situacao TEXT,
+    data_abertura TEXT,
+    cnae_principal TEXT,
+    uf TEXT,
+    email TEXT
+);
+CREATE TABLE IF NOT EXISTS cnaes (
+    codigo TEXT PRIMARY KEY,
+    descricao TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _iter_rows(path):
+    """Yield the rows of a dump file, reading zip archives without extracting them."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                with archive.open(member) as raw:
+                    text = io.TextIOWrapper(raw, encoding="latin1", newline="")
+                    yield from csv.reader(text, delimiter=";", quotechar='"')
+    else:
+        with open(path, encoding="latin1", newline="") as file:
+            yield from csv.reader(file, delimiter=";", quotechar='"')
+
+def _dump_files(dump_dir, kind):
+    """Find the dump files of a given kind (e.g. 'EMPRE', 'ESTABELE', 'CNAE')."""
+    return sorted(
+        path for path in glob.glob(os.path.join(dump_dir, "*"))
+        if kind in os.path.basename(path).upper()
+    )
+
+def _insert_batches(conn, sql, rows):
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INGEST_BATCH_SIZE:
+            conn.executemany(sql, batch)
+            conn.commit()
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        conn.commit()
+        count += len(batch)
+    return count
+
+def ingest(dump_dir, db_path=REGISTRY_DB_FILE, snapshot_date=None):
+    """
+    Ingest the Receita Federal CNPJ dumps into the local registry.
+
+    Args:
+        dump_dir (str): Directory with the Empresas*, Estabelecimentos* and Cnaes* files (zipped or extracted).
+        db_path (str): Path of the SQLite registry to create or update.
+        snapshot_date (str): Date of the dump (YYYY-MM-DD), reported as 'ultima_atualizacao'. Defaults to today.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    # The registry is rebuilt from the dumps, so durability is not needed while ingesting
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    for path in _dump_files(dump_dir, "CNAE"):
+        count = _insert_batches(
+            conn,
+            "INSERT OR REPLACE INTO cnaes VALUES (?, ?)",
+            ((row[0], row[1]) for row in _iter_rows(path)),
+        )
+        print(f"{count} activities ingested from {path}.")
+
+    for path in _dump_files(dump_dir, "EMPRE"):
+        count = _insert_batches(
+            conn,
+            "INSERT OR REPLACE INTO empresas VALUES (?, ?, ?, ?)",
+            ((row[0], row[1], row[4], row[5]) for row in _iter_rows(path)),
+        )
+        print(f"{count} companies ingested from {path}.")
+
+    for path in _dump_files(dump_dir, "ESTABELE"):
+        count = _insert_batches(
+            conn,
+            "INSERT OR REPLACE INTO estabelecimentos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (row[0] + row[1] + row[2], row[0], row[3], row[4], row[5], row[6], row[10], row[11], row[19], row[27])
+                for row in _iter_rows(path)
+            ),
+        )
+        print(f"{count} establishments ingested from {path}.")
+
+    snapshot_date = snapshot_date or date.today().isoformat()
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('snapshot_date', ?)", (snapshot_date,))
+    conn.commit()
+    conn.close()
+
+def _format_date(value):
+    """Convert a dump date (YYYYMMDD) to the DD/MM/YYYY format used by ReceitaWS."""
+    try:
+        return datetime.strptime(value, "%Y%m%d").strftime("%d/%m/%Y")
+    except (TypeError, ValueError):
+        return ""
+
+def _format_cnae(code):
+    """Format a CNAE code as ReceitaWS does, e.g. 6201501 -> 62.01-5-01."""
+    code = (code or "").zfill(7)
+    return f"{code[:2]}.{code[2:4]}-{code[4]}-{code[5:]}"
+
+class LocalRegistry:
+    """Read-only lookups on the local registry, returning ReceitaWS-shaped records."""
+
+    def __init__(self, db_path=REGISTRY_DB_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._snapshot = None
+
+    def _connection(self):
+        # SQLite connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def available(self):
+        return os.path.exists(self.db_path)
+
+    def snapshot_date(self):
+        if self._snapshot is None:
+            row = self._connection().execute("SELECT value FROM meta WHERE key = 'snapshot_date'").fetchone()
+            self._snapshot = row[0] if row else date.today().isoformat()
+        return self._snapshot
+
+    def lookup(self, cnpj):
+        """
+        Look up a CNPJ in the local registry.
+
+        Args:
+            cnpj (str): The company's CNPJ, with or without formatting.
+
+        Returns:
+            dict: The registry record in the ReceitaWS format, or None if not found.
+        """
+        cnpj = re.sub(r"\D", "", str(cnpj)).zfill(14)
+        row = self._connection().execute(
+            """
+            SELECT e.matriz_filial, e.nome_fantasia, e.situacao, e.data_situacao, e.data_abertura,
+                   e.cnae_principal, e.uf, e.email, c.descricao,
+                   m.razao_social, m.capital_social, m.porte
+            FROM estabelecimentos e
+            LEFT JOIN empresas m ON m.cnpj_basico = e.cnpj_basico
+            LEFT JOIN cnaes c ON c.codigo = e.cnae_principal
+            WHERE e.cnpj = ?
+            """,
+            (cnpj,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        (matriz_filial, fantasia, situacao, data_situacao, abertura,
+         cnae, uf, email, cnae_text, nome, capital_social, porte) = row
+
+        return {
+            "cnpj": f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}",
+            "tipo": TIPOS.get(matriz_filial, ""),
+            "abertura": _format_date(abertura),
+            "nome": nome or "",
+            "fantasia": fantasia or "",
+            "atividade_principal": [{"code": _format_cnae(cnae), "text": cnae_text or ""}],
+            "situacao": SITUACOES.get((situacao or "").zfill(2), ""),
+            "data_situacao": _format_date(data_situacao),
+            "uf": uf or "",
+            "email": email or "",
+            "porte": PORTES.get(porte, ""),
+            "capital_social": (capital_social or "0").replace(".", "").replace(",", "."),
+            "status": "OK",
+            "ultima_atualizacao": f"{self.snapshot_date()}T00:00:00.000Z",
+        }
+
+local_registry = LocalRegistry()
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local CNPJ registry.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest the Receita Federal CNPJ dumps.")
+    ingest_parser.add_argument("dump_dir", help="Directory with the downloaded dump files.")
+    ingest_parser.add_argument("--db", default=REGISTRY_DB_FILE, help="Registry database file.")
+    ingest_parser.add_argument("--snapshot-date", default=None, help="Date of the dump (YYYY-MM-DD).")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        ingest(args.dump_dir, args.db, args.snapshot_date)
+
+if __name__ == "__main__":
+    main()
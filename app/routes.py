@@ -1,4 +1,4 @@
-from flask import Blueprint, redirect, render_template, request, jsonify
+from flask import Blueprint, Response, g, redirect, render_template, request, jsonify, stream_with_context, url_for
 from flask_swagger_ui import get_swaggerui_blueprint
 from .service import (
     fetch_cnpj_data,
@@ -9,8 +9,32 @@ from .service import (
     fetch_reputation,
     pesquisaprotesto_search_protests,
 )
+from .batch import iter_batch
+from .client import DriverPoolTimeout
+from .jobs import JOB_MAX_CNPJS, job_queue
+from .metrics import render as render_metrics
+from .tracing import TRACE_DIR, TRACE_PROFILE, TRACE_REQUESTS, Trace
+from .utils import normalize_cnpj
+import json
+import os
+import pandas as pd
 import requests
 
+# Limits of the batch endpoints
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+
+# Routes that can be traced. The others answer at once or stream their results.
+TRACED_ENDPOINTS = {
+    "credit_analysis.cnpj_data",
+    "credit_analysis.cnpj_data_route",
+    "credit_analysis.reputation",
+    "credit_analysis.protests",
+    "credit_analysis.instagram_followers",
+    "credit_analysis.facebook_followers",
+    "credit_analysis.government_contracts",
+}
+
 # Configure Blueprint to use a specific templates folder
 routes_bp = Blueprint(
     "credit_analysis",
@@ -30,6 +54,150 @@ swagger_ui_blueprint = get_swaggerui_blueprint(
 # Register Swagger UI Blueprint
 routes_bp.register_blueprint(swagger_ui_blueprint, url_prefix=SWAGGER_URL)
 
+def flag_requested(name):
+    """Tell whether a boolean query parameter (e.g. ?refresh=1) is set."""
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+def refresh_requested():
+    """Tell whether the caller asked to bypass the result cache (?refresh=1)."""
+    return flag_requested("refresh")
+
+@routes_bp.before_request
+def start_trace():
+    """
+    Trace the request when asked for with ?trace=1 (or ?profile=1 to also run
+    cProfile), or when TRACE_REQUESTS traces every request.
+    """
+    if request.endpoint not in TRACED_ENDPOINTS:
+        return
+    in_response = flag_requested("trace") or flag_requested("profile")
+    if not (TRACE_REQUESTS or in_response):
+        return
+    trace = Trace(f"{request.method} {request.full_path.rstrip('?')}", profile=TRACE_PROFILE or flag_requested("profile"))
+    g.trace = trace
+    g.trace_in_response = in_response
+    g.trace_token = trace.activate()
+    g.trace_profiler = trace.start_profiler()
+
+def _stop_trace():
+    trace = g.pop("trace", None)
+    if trace is not None:
+        trace.stop_profiler(g.pop("trace_profiler"))
+        trace.deactivate(g.pop("trace_token"))
+        trace.finish()
+    return trace
+
+@routes_bp.after_request
+def finish_trace(response):
+    """Save the trace to TRACE_DIR and, if the caller asked for it, add it to the response as '_trace'."""
+    trace = _stop_trace()
+    if trace is None:
+        return response
+
+    if TRACE_DIR:
+        paths = trace.write(TRACE_DIR)
+        print(f"Trace of {trace.name} ({trace.duration:.2f} s) saved to {', '.join(paths)}")
+
+    if g.pop("trace_in_response") and response.is_json:
+        data = response.get_json()
+        if isinstance(data, dict):
+            data["_trace"] = trace.to_dict(include_profile=True)
+            response.set_data(json.dumps(data, default=str))
+    return response
+
+@routes_bp.teardown_request
+def discard_trace(exception=None):
+    """Stop a trace left active by a request that failed before after_request."""
+    _stop_trace()
+
+def _company_data_item(cnpj, data):
+    return {"error": data["error"], "cnpj": cnpj} if "error" in data else data
+
+def _protests_item(cnpj, protest_info):
+    if protest_info is None:
+        return {"cnpj": cnpj, "error": "No protests found for the given CNPJ"}
+    total_protests, total_protested_value = protest_info
+    return {"cnpj": cnpj, "total_protests": total_protests, "total_protested_value": total_protested_value}
+
+def _reputation_item(company_name, rating):
+    if rating is None:
+        return {"company_name": company_name, "error": "Unable to query Reclame Aqui"}
+    if rating == 0:
+        return {"company_name": company_name, "error": "Company not found on Reclame Aqui"}
+    return {"company_name": company_name, "rating": rating}
+
+def _followers_item(network):
+    def item(company_name, result):
+        url, followers = result
+        if pd.isna(followers):
+            return {"company_name": company_name, "error": f"Company {network.capitalize()} page not found"}
+        return {"company_name": company_name, f"{network}_url": url, "followers": followers}
+    return item
+
+# Function, input key and response builder of each batch endpoint
+BATCH_SOURCES = {
+    "company-data": (fetch_company_data, "cnpjs", _company_data_item),
+    "cnpj-data": (fetch_cnpj_data, "cnpjs", _company_data_item),
+    "protests": (pesquisaprotesto_search_protests, "cnpjs", _protests_item),
+    "government-contracts": (
+        fetch_government_contracts, "cnpjs",
+        lambda cnpj, has_contracts: (
+            {"cnpj": cnpj, "error": "Unable to query the Transparency Portal"} if has_contracts is None
+            else {"cnpj": cnpj, "has_government_contracts": has_contracts}
+        ),
+    ),
+    "reputation": (fetch_reputation, "company_names", _reputation_item),
+    "instagram-followers": (fetch_instagram_followers, "company_names", _followers_item("instagram")),
+    "facebook-followers": (fetch_facebook_followers, "company_names", _followers_item("facebook")),
+}
+
+def without_nan(value):
+    """Replace the NaN values of a result (e.g. a source that returned nothing) with None, which JSON encodes as null."""
+    if isinstance(value, dict):
+        return {key: without_nan(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [without_nan(item) for item in value]
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+def stream_batch(source):
+    """
+    Run a source over the list of CNPJs or company names in the request body,
+    streaming one JSON line per item as soon as it finishes.
+    """
+    func, key, build_item = BATCH_SOURCES[source]
+    body = request.get_json(silent=True) or {}
+    values = body.get(key)
+    if not values or not isinstance(values, list):
+        return jsonify({"error": f"A list of '{key}' is required"}), 400
+
+    # Drop repeated entries, keeping the order of the first occurrence
+    if key == "cnpjs":
+        items = list(dict.fromkeys(normalize_cnpj(value) for value in values))
+    else:
+        items = list(dict.fromkeys(str(value).strip() for value in values if str(value).strip()))
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"A batch accepts at most {BATCH_MAX_ITEMS} items"}), 400
+
+    refresh = refresh_requested() or bool(body.get("refresh"))
+    field = "cnpj" if key == "cnpjs" else "company_name"
+
+    def generate():
+        fetch = lambda item: func(item, refresh=refresh)
+        for item, result, error in iter_batch(fetch, items, workers=BATCH_WORKERS):
+            if isinstance(error, DriverPoolTimeout):
+                line = {field: item, "error": f"Service busy: {str(error)}"}
+            elif isinstance(error, requests.exceptions.RequestException):
+                line = {field: item, "error": f"External service error: {str(error)}"}
+            elif error is not None:
+                line = {field: item, "error": f"Internal server error: {str(error)}"}
+            else:
+                line = build_item(item, result)
+            yield json.dumps(without_nan(line), default=str, allow_nan=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
 # Route to display a welcome message and redirect to Swagger UI
 @routes_bp.route("/", methods=["GET"])
 def home():
@@ -44,7 +212,7 @@ def cnpj_data():
         return jsonify({"error": "CNPJ parameter is required"}), 400
 
     try:
-        data = fetch_company_data(cnpj)
+        data = fetch_company_data(cnpj, refresh=refresh_requested())
         if "error" in data:
             return jsonify({"error": data["error"]}), 404
         return jsonify(data)
@@ -53,6 +221,37 @@ def cnpj_data():
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+# Route to enqueue the assessment of one or many CNPJs without waiting for it
+@routes_bp.route("/company-data/jobs", methods=["POST"])
+def create_company_data_job():
+    body = request.get_json(silent=True) or {}
+    cnpjs = body.get("cnpjs") or ([body["cnpj"]] if body.get("cnpj") else [])
+    if not cnpjs or not isinstance(cnpjs, list):
+        return jsonify({"error": "A 'cnpj' or a list of 'cnpjs' is required"}), 400
+    if len(cnpjs) > JOB_MAX_CNPJS:
+        return jsonify({"error": f"A job accepts at most {JOB_MAX_CNPJS} CNPJs"}), 400
+
+    refresh = refresh_requested() or bool(body.get("refresh"))
+    job_id = job_queue.submit([str(cnpj) for cnpj in cnpjs], callback_url=body.get("callback_url"), refresh=refresh)
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": url_for("credit_analysis.company_data_job", job_id=job_id),
+    }), 202
+
+# Route to poll the status and the partial results of a job
+@routes_bp.route("/company-data/jobs/<job_id>", methods=["GET"])
+def company_data_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+# Routes to assess many CNPJs or company names in one request, streamed as NDJSON
+@routes_bp.route("/<any('company-data', 'cnpj-data', 'protests', 'government-contracts', 'reputation', 'instagram-followers', 'facebook-followers'):source>/batch", methods=["POST"])
+def batch(source):
+    return stream_batch(source)
+
 # Route to fetch the reputation of a company on Reclame Aqui
 @routes_bp.route("/reputation", methods=["GET"])
 def reputation():
@@ -61,10 +260,14 @@ def reputation():
         return jsonify({"error": "Company name parameter is required"}), 400
 
     try:
-        rating = fetch_reputation(company_name)
+        rating = fetch_reputation(company_name, cnpj=request.args.get("cnpj"), refresh=refresh_requested())
+        if rating is None:
+            return jsonify({"error": "External service error: Unable to query Reclame Aqui"}), 500
         if rating == 0:
             return jsonify({"error": "Company not found on Reclame Aqui"}), 404
         return jsonify({"company_name": company_name, "rating": rating})
+    except DriverPoolTimeout as e:
+        return jsonify({"error": f"Service busy: {str(e)}"}), 503
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"External service error: {str(e)}"}), 500
     except Exception as e:
@@ -78,7 +281,7 @@ def protests():
         return jsonify({"error": "CNPJ parameter is required"}), 400
 
     try:
-        protest_info = pesquisaprotesto_search_protests(cnpj)
+        protest_info = pesquisaprotesto_search_protests(cnpj, refresh=refresh_requested())
         if protest_info is None:
             return jsonify({"error": "No protests found for the given CNPJ"}), 404
         
@@ -91,6 +294,8 @@ def protests():
             "total_protests": total_protests,
             "total_protested_value": total_protested_value
         })
+    except DriverPoolTimeout as e:
+        return jsonify({"error": f"Service busy: {str(e)}"}), 503
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"External service error: {str(e)}"}), 500
     except Exception as e:
@@ -104,10 +309,12 @@ def instagram_followers():
         return jsonify({"error": "Company name parameter is required"}), 400
 
     try:
-        url, followers = fetch_instagram_followers(company_name)
-        if followers is None:
+        url, followers = fetch_instagram_followers(company_name, cnpj=request.args.get("cnpj"), refresh=refresh_requested())
+        if pd.isna(followers):
             return jsonify({"error": "Company Instagram page not found"}), 404
         return jsonify({"company_name": company_name, "instagram_url": url, "followers": followers})
+    except DriverPoolTimeout as e:
+        return jsonify({"error": f"Service busy: {str(e)}"}), 503
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"External service error: {str(e)}"}), 500
     except Exception as e:
@@ -121,10 +328,12 @@ def facebook_followers():
         return jsonify({"error": "Company name parameter is required"}), 400
 
     try:
-        url, followers = fetch_facebook_followers(company_name)
-        if followers is None:
+        url, followers = fetch_facebook_followers(company_name, cnpj=request.args.get("cnpj"), refresh=refresh_requested())
+        if pd.isna(followers):
             return jsonify({"error": "Company Facebook page not found"}), 404
         return jsonify({"company_name": company_name, "facebook_url": url, "followers": followers})
+    except DriverPoolTimeout as e:
+        return jsonify({"error": f"Service busy: {str(e)}"}), 503
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"External service error: {str(e)}"}), 500
     except Exception as e:
@@ -138,7 +347,9 @@ def government_contracts():
         return jsonify({"error": "CNPJ parameter is required"}), 400
 
     try:
-        has_contracts = fetch_government_contracts(cnpj)
+        has_contracts = fetch_government_contracts(cnpj, refresh=refresh_requested())
+        if has_contracts is None:
+            return jsonify({"error": "External service error: Unable to query the Transparency Portal"}), 500
         return jsonify({"cnpj": cnpj, "has_government_contracts": has_contracts})
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"External service error: {str(e)}"}), 500
@@ -153,11 +364,16 @@ def cnpj_data_route():
         return jsonify({"error": "CNPJ parameter is required"}), 400
 
     try:
-        cnpj_data = fetch_cnpj_data(cnpj)
+        cnpj_data = fetch_cnpj_data(cnpj, refresh=refresh_requested())
         if "error" in cnpj_data:
             return jsonify({"error": cnpj_data["error"]}), 404
         return jsonify(cnpj_data)
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"External service error: {str(e)}"}), 500
     except Exception as e:
-        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+# Route to expose latency and outcome metrics in the Prometheus text format
+@routes_bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
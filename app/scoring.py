@@ -0,0 +1,220 @@
+"""
+Credit scoring of the collected company data.
+
+Every signal is normalized to the 0-1 range (1 being the lowest risk) and
+combined into a weighted score from 0 to 1000, which is then mapped to a risk
+band. All steps are vectorized over whole columns, so a results table of a
+million rows is re-scored in seconds after a change of weights.
+
+Usage:
+    python -m app.scoring <results.parquet|.jsonl|.xlsx|.csv> [--output scored.csv] [--weights status=30,protests=25]
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Weight of each signal in the score. Can be overridden with SCORE_WEIGHTS,
+# e.g. "status=30,protests=25".
+DEFAULT_WEIGHTS = {
+    "status": 25,
+    "protests": 20,
+    "protested_value": 15,
+    "government_contracts": 10,
+    "social_capital": 15,
+    "size": 5,
+    "followers": 10,
+}
+
+# Lowest score of each risk band, from the safest band down. Can be
+# overridden with SCORE_BANDS, e.g. "low=750,medium=450,high=0".
+DEFAULT_BANDS = {
+    "low": 700,
+    "medium": 400,
+    "high": 0,
+}
+
+# Value of a signal that could not be collected, halfway between best and worst
+NEUTRAL = 0.5
+
+SIZE_SIGNALS = {
+    "MICRO EMPRESA": 0.3,
+    "ME": 0.3,
+    "EMPRESA DE PEQUENO PORTE": 0.6,
+    "EPP": 0.6,
+    "DEMAIS": 1.0,
+}
+
+# Social capital (in BRL) and follower count at which their signals saturate
+SOCIAL_CAPITAL_CAP = 10_000_000
+FOLLOWERS_CAP = 1_000_000
+
+FOLLOWERS_PATTERN = r"^\s*([\d.,]+)\s*(mil|mi|k|m)?"
+FOLLOWER_MULTIPLIERS = {"mil": 1e3, "k": 1e3, "mi": 1e6, "m": 1e6}
+
+def parse_weights(value):
+    """Parse a 'name=number,name=number' string into a dict."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, number = item.partition("=")
+        weights[name.strip()] = float(number)
+    return weights
+
+def load_weights():
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(parse_weights(os.getenv("SCORE_WEIGHTS", "")))
+    return weights
+
+def load_bands():
+    bands = dict(DEFAULT_BANDS)
+    if os.getenv("SCORE_BANDS"):
+        bands = parse_weights(os.getenv("SCORE_BANDS"))
+    return bands
+
+def _by_unique(values, func):
+    """
+    Apply a column function to the distinct values only and broadcast the result.
+
+    Text columns such as status, size or the abbreviated follower counts repeat
+    a few values over many rows, so this avoids most of the string processing.
+    """
+    codes, uniques = pd.factorize(values)
+    mapped = np.asarray(func(pd.Series(uniques, dtype=object)), dtype=float)
+    return pd.Series(np.where(codes >= 0, mapped[codes] if len(mapped) else np.nan, np.nan), index=values.index)
+
+def _parse_follower_text(text):
+    parts = text.astype(str).str.lower().str.extract(FOLLOWERS_PATTERN)
+    number, suffix = parts[0], parts[1]
+    # '1.234' is a thousands separator, while '1,2' is a decimal comma
+    number = number.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    multiplier = suffix.map(FOLLOWER_MULTIPLIERS).fillna(1)
+    return pd.to_numeric(number, errors="coerce") * multiplier
+
+def parse_followers(values):
+    """
+    Convert follower counts to numbers, vectorized.
+
+    Accepts numbers and the abbreviated strings shown by Facebook, such as
+    '1,2 mil' or '3 mi'. Values that cannot be parsed become NaN.
+    """
+    values = pd.Series(values)
+    is_text = values.map(type) == str
+    numeric = pd.to_numeric(values.where(~is_text), errors="coerce")
+    numeric = numeric.astype(float)
+    if is_text.any():
+        numeric[is_text] = _by_unique(values[is_text], _parse_follower_text)
+    return numeric
+
+def _column(df, name):
+    """Return a column as a Series, or an all-NaN Series if it is missing."""
+    if name in df:
+        return df[name]
+    return pd.Series(np.nan, index=df.index)
+
+def signals(df):
+    """
+    Compute the normalized signal (0 = riskiest, 1 = safest) of each scoring factor.
+
+    Returns:
+        DataFrame: One column per signal, with NaN where the data is missing.
+    """
+    protests = pd.to_numeric(_column(df, "protests"), errors="coerce")
+    protested_value = pd.to_numeric(_column(df, "protested_value"), errors="coerce")
+    social_capital = pd.to_numeric(_column(df, "social_capital"), errors="coerce")
+    status = _column(df, "status")
+    government_contracts = _column(df, "government_contracts")
+
+    followers = (
+        parse_followers(_column(df, "instagram_followers")).fillna(0)
+        + parse_followers(_column(df, "facebook_followers")).fillna(0)
+    )
+    no_followers_data = _column(df, "instagram_followers").isna() & _column(df, "facebook_followers").isna()
+
+    capital_floor = np.maximum(social_capital.fillna(0).to_numpy(), 1)
+    return pd.DataFrame({
+        "status": _by_unique(status, lambda values: (values.astype(str).str.upper() == "ATIVA").astype(float)),
+        "protests": 1 / (1 + protests),
+        "protested_value": 1 - np.clip(protested_value / capital_floor, 0, 1),
+        "government_contracts": government_contracts.map({True: 1.0, False: 0.0, "True": 1.0, "False": 0.0}),
+        "social_capital": np.clip(np.log10(social_capital.clip(lower=0) + 1) / np.log10(SOCIAL_CAPITAL_CAP), 0, 1),
+        "size": _by_unique(_column(df, "size"), lambda values: values.astype(str).str.upper().map(SIZE_SIGNALS)),
+        "followers": np.where(
+            no_followers_data, np.nan, np.clip(np.log10(followers + 1) / np.log10(FOLLOWERS_CAP), 0, 1)
+        ),
+    }, index=df.index).astype(float)
+
+def score_frame(df, weights=None, bands=None):
+    """
+    Score a table of company data.
+
+    Args:
+        df (DataFrame): Results as produced by main.py or fetch_company_data.
+        weights (dict): Weight of each signal. Defaults to DEFAULT_WEIGHTS and SCORE_WEIGHTS.
+        bands (dict): Lowest score of each risk band. Defaults to DEFAULT_BANDS and SCORE_BANDS.
+
+    Returns:
+        DataFrame: A copy of df with the 'score' (0-1000) and 'risk_band' columns.
+    """
+    weights = weights or load_weights()
+    bands = bands or load_bands()
+
+    factors = signals(df)
+    names = [name for name in weights if name in factors]
+    weight_vector = np.array([weights[name] for name in names], dtype=float)
+    values = factors[names].fillna(NEUTRAL).to_numpy()
+    score = np.rint(1000 * values @ weight_vector / weight_vector.sum())
+
+    # Bands sorted from the highest threshold down; the first one reached wins
+    ordered = sorted(bands.items(), key=lambda item: item[1], reverse=True)
+    risk_band = np.select(
+        [score >= threshold for _, threshold in ordered],
+        [name for name, _ in ordered],
+        default=ordered[-1][0],
+    )
+
+    # Rows of failed lookups carry no data to score
+    missing = _column(df, "status").isna().to_numpy()
+    scored = df.copy()
+    scored["score"] = pd.array(np.where(missing, np.nan, score), dtype="Int64")
+    scored["risk_band"] = pd.Series(np.where(missing, None, risk_band), index=df.index, dtype="object")
+    return scored
+
+def score_record(record, weights=None, bands=None):
+    """
+    Score a single fetch_company_data record.
+
+    Returns:
+        tuple: The score (0-1000) and the risk band.
+    """
+    scored = score_frame(pd.DataFrame([record]), weights, bands).iloc[0]
+    if pd.isna(scored["score"]):
+        return None, None
+    return int(scored["score"]), scored["risk_band"]
+
+def main():
+    # Imported here, since the checkpoint module uses parse_followers
+    from .checkpoint import read_results, typed_frame
+
+    parser = argparse.ArgumentParser(description="Score a table of company data.")
+    parser.add_argument("input", help="Results file (.parquet, .jsonl, .xlsx or .csv).")
+    parser.add_argument("--output", default=None, help="Scored file (.parquet, .csv or .xlsx). Defaults to <input>_scored.csv.")
+    parser.add_argument("--weights", default=None, help="Signal weights, e.g. status=30,protests=25.")
+    args = parser.parse_args()
+
+    weights = load_weights()
+    if args.weights:
+        weights.update(parse_weights(args.weights))
+
+    scored = score_frame(read_results(args.input), weights)
+    output = args.output or f"{os.path.splitext(args.input)[0]}_scored.csv"
+    if output.endswith(".parquet"):
+        typed_frame(scored).to_parquet(output, index=False)
+    elif output.endswith(".xlsx"):
+        scored.to_excel(output, index=False)
+    else:
+        scored.to_csv(output, index=False)
+    print(f"{len(scored)} rows scored and saved to {output}.")
+    print(scored["risk_band"].value_counts().to_string())
+
+if __name__ == "__main__":
+    main()
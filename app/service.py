@@ -1,20 +1,33 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from functools import lru_cache, partial
+import json
 import os
-import random
 import re
+import threading
 import time
 from dotenv import load_dotenv
 import numpy as np
-import requests
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from unidecode import unidecode
+from urllib.parse import urlparse
 import urllib3
-from .client import DriverManager
-from .recaptcha_solver import ReCAPTCHASolver
-from .utils import format_cnpj
+from . import http_client
+from .cache import cached
+from .client import DriverPool
+from .handles import handle_index
+from .limits import limited
+from .pacing import PacingPolicy
+from .metrics import instrument, mark_outcome, outcome_for, timed_page_load
+from .registry import local_registry
+from .scoring import score_record
+from .sessions import SessionStore
+from .singleflight import single_flight
+from .tracing import propagate, span
+from .utils import BROWSER_USER_AGENT, format_cnpj, normalize_cnpj
 
 # Disable warnings for unverified HTTPS requests
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -22,68 +35,372 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # Load variables from the .env file
 load_dotenv()
 
-INSTAGRAM_COOKIES_FILE = "instagram_cookies.pkl"
-INSTAGRAM_URL = "https://www.instagram.com"
+# Endpoints of the upstream services. They can be pointed at local stand-ins,
+# e.g. by the benchmark suite in benchmarks/.
+RECEITAWS_URL = os.getenv("RECEITAWS_URL", "https://www.receitaws.com.br/v1/cnpj")
+PORTAL_TRANSPARENCIA_URL = os.getenv("PORTAL_TRANSPARENCIA_URL", "https://api.portaldatransparencia.gov.br/api-de-dados")
+RECLAMEAQUI_URL = os.getenv("RECLAMEAQUI_URL", "https://www.reclameaqui.com.br/empresa")
+
+# How fetch_reputation reads the rating: "http-first" parses the data payload
+# embedded in the page and falls back to the browser, "http" never uses the
+# browser and "browser" always renders the page
+REPUTATION_FETCH_MODE = os.getenv("REPUTATION_FETCH_MODE", "http-first")
+NEXT_DATA_PATTERN = re.compile(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', re.DOTALL)
+
+# How the protest details are read: "bulk" parses the search API responses
+# captured by the browser in one pass and falls back to the "modal" mode,
+# which opens the 'Detalhes' modal of each notary office
+PROTEST_EXTRACTION_MODE = os.getenv("PROTEST_EXTRACTION_MODE", "bulk")
+# Keys of the protest count and protested value in the search API payloads
+PROTEST_COUNT_KEYS = ("qtdTitulos", "quantidadeTitulos", "qtdProtestos", "quantidadeProtestos")
+PROTEST_VALUE_KEYS = ("valorProtestado", "vlProtestado", "valor_protestado")
+
+# Persisted pesquisaprotesto session, shared by the pooled browsers. It is
+# renewed ahead of its assumed expiry, so logins stay out of the request path.
+PESQUISAPROTESTO_URL = os.getenv("PESQUISAPROTESTO_URL", "https://www.pesquisaprotesto.com.br")
+PESQUISAPROTESTO_SESSION_FILE = os.getenv("PESQUISAPROTESTO_SESSION_FILE", "pesquisaprotesto_session.pkl")
+PESQUISAPROTESTO_SESSION_TTL = float(os.getenv("PESQUISAPROTESTO_SESSION_TTL", 12 * 60 * 60))
+PESQUISAPROTESTO_SESSION_REFRESH_MARGIN = float(os.getenv("PESQUISAPROTESTO_SESSION_REFRESH_MARGIN", 30 * 60))
+# Longest wait of the background renewal between failed attempts
+PESQUISAPROTESTO_SESSION_MAX_BACKOFF = float(os.getenv("PESQUISAPROTESTO_SESSION_MAX_BACKOFF", 60 * 60))
+
+INSTAGRAM_COOKIES_FILE = os.getenv("INSTAGRAM_COOKIES_FILE", "instagram_cookies.pkl")
+INSTAGRAM_URL = os.getenv("INSTAGRAM_URL", "https://www.instagram.com")
+FACEBOOK_URL = os.getenv("FACEBOOK_URL", "https://www.facebook.com")
+
+# Messages shown in place of a profile that does not exist. Only these are
+# recorded as a missing page in the handle index; any other failure to find
+# the followers (slow load, login wall, checkpoint) may be transient.
+PAGE_NOT_FOUND_MESSAGES = {
+    "instagram": ("sorry, this page isn't available", "esta página não está disponível"),
+    "facebook": (
+        "this content isn't available", "este conteúdo não está disponível",
+        "this page isn't available", "esta página não está disponível",
+    ),
+}
+
+# Registry backend of fetch_cnpj_data: "receitaws" (API) or "local" (open-data snapshot)
+REGISTRY_BACKEND = os.getenv("REGISTRY_BACKEND", "receitaws")
+
+# Run the independent sources of fetch_company_data concurrently
+COMPANY_DATA_FAN_OUT = os.getenv("COMPANY_DATA_FAN_OUT", "1") == "1"
+
+# Per-source timeouts (in seconds) used by the fan-out mode. They include the
+# time spent waiting for a free browser in the driver pool.
+SOURCE_TIMEOUTS = {
+    "protests": float(os.getenv("PROTESTS_TIMEOUT", 300)),
+    "government_contracts": float(os.getenv("GOVERNMENT_CONTRACTS_TIMEOUT", 30)),
+    "instagram": float(os.getenv("INSTAGRAM_TIMEOUT", 120)),
+    "facebook": float(os.getenv("FACEBOOK_TIMEOUT", 120)),
+}
+
+# Pools of headless browsers shared by the scraping functions, one per browser profile
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", 3))
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", 50))
+DRIVER_MAX_WAIT = float(os.getenv("DRIVER_MAX_WAIT", 120))
+
+# Browser profile of each source (see utils.BROWSER_PROFILES). Protests keep
+# the default profile, since the reCAPTCHA audio challenge needs media.
+SOURCE_BROWSER_PROFILES = {
+    "protests": os.getenv("BROWSER_PROFILE_PROTESTS", "default"),
+    "reputation": os.getenv("BROWSER_PROFILE_REPUTATION", "lean"),
+    "instagram": os.getenv("BROWSER_PROFILE_INSTAGRAM", "lean"),
+    "facebook": os.getenv("BROWSER_PROFILE_FACEBOOK", "lean"),
+}
+
+def pool_size(profile):
+    """Number of browsers in the pool of a profile (DRIVER_POOL_SIZE_<PROFILE>, defaults to DRIVER_POOL_SIZE)."""
+    return int(os.getenv(f"DRIVER_POOL_SIZE_{profile.upper()}", DRIVER_POOL_SIZE))
+
+# The driver pools and the reCAPTCHA solver are heavy (ChromeDriver and FFmpeg
+# downloads, browser start-up), so they are created on first use and importing
+# this module stays cheap for processes that only need the REST sources.
+_pools = {}
+_solver = None
+
+pesquisaprotesto_session = SessionStore(
+    PESQUISAPROTESTO_URL,
+    PESQUISAPROTESTO_SESSION_FILE,
+    PESQUISAPROTESTO_SESSION_TTL,
+    PESQUISAPROTESTO_SESSION_REFRESH_MARGIN,
+)
+_init_lock = threading.Lock()
+
+def get_profile_pool(profile):
+    """Return the driver pool of a browser profile, creating it on first use."""
+    if profile not in _pools:
+        with _init_lock:
+            if profile not in _pools:
+                _pools[profile] = DriverPool(
+                    INSTAGRAM_URL,
+                    INSTAGRAM_COOKIES_FILE,
+                    size=pool_size(profile),
+                    max_uses=DRIVER_MAX_USES,
+                    max_wait=DRIVER_MAX_WAIT,
+                    profile=profile,
+                    save_cookies=profile == SOURCE_BROWSER_PROFILES["instagram"],
+                )
+    return _pools[profile]
+
+def get_pool(source=None):
+    """Return the driver pool used by a source."""
+    return get_profile_pool(SOURCE_BROWSER_PROFILES.get(source, "default"))
+
+def get_solver():
+    """Return the shared reCAPTCHA solver, creating it on first use."""
+    global _solver
+    if _solver is None:
+        with _init_lock:
+            if _solver is None:
+                from .recaptcha_solver import ReCAPTCHASolver
+                _solver = ReCAPTCHASolver()
+    return _solver
+
+def warm_up(browsers=1, solver=True, login=True):
+    """
+    Initialize the heavy resources ahead of the first request.
+
+    Args:
+        browsers (int): Number of browsers to start in the pool of each browser profile.
+        solver (bool): Whether to set up the reCAPTCHA solver as well.
+        login (bool): Whether to log in to pesquisaprotesto if there is no fresh session.
+    """
+    if browsers:
+        for profile in set(SOURCE_BROWSER_PROFILES.values()):
+            get_profile_pool(profile).warm_up(browsers)
+    if solver:
+        get_solver()
+    if login and not pesquisaprotesto_session.is_fresh():
+        refresh_pesquisaprotesto_session()
+
+# Worker lane of each source in the fan-out mode. Browser-backed sources get
+# their own lane, sized to the driver pools, so slow page loads never starve
+# the HTTP-only sources.
+SOURCE_LANES = {
+    "protests": "browser",
+    "government_contracts": "http",
+    "instagram": "browser",
+    "facebook": "browser",
+}
+
+# Shared executors for the fan-out mode. Module-level pools are used so that a
+# source which exceeds its timeout does not block the caller on shutdown.
+lane_executors = {}
+
+def configure_lanes(http_workers=None, browser_workers=None):
+    """
+    (Re)create the executors of the HTTP and browser lanes.
+
+    Args:
+        http_workers (int): Threads for the HTTP-only sources. Defaults to SOURCE_WORKERS.
+        browser_workers (int): Threads for the browser-backed sources. Defaults to
+            the total size of the driver pools.
+    """
+    sizes = {
+        "http": http_workers or int(os.getenv("SOURCE_WORKERS", 8)),
+        "browser": browser_workers or sum(pool_size(profile) for profile in set(SOURCE_BROWSER_PROFILES.values())),
+    }
+    for lane, size in sizes.items():
+        previous = lane_executors.get(lane)
+        lane_executors[lane] = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{lane}-lane")
+        if previous:
+            previous.shutdown(wait=False)
+
+configure_lanes()
 
-manager = DriverManager(INSTAGRAM_URL, INSTAGRAM_COOKIES_FILE)
-solver = ReCAPTCHASolver()
+def name_key(company_name):
+    """Normalize a company name for comparing lookups (case, accents and surrounding spaces)."""
+    return unidecode(str(company_name)).strip().lower()
+
+def _has_value(result):
+    """Tell whether a fetch result carries data worth caching."""
+    if result is None:
+        return False
+    if isinstance(result, dict):
+        return "error" not in result
+    if isinstance(result, tuple):
+        return not any(isinstance(item, float) and np.isnan(item) for item in result)
+    if isinstance(result, (int, float)) and not isinstance(result, bool):
+        return not np.isnan(result) and result != 0
+    return True
+
+def load_page(driver, url, source):
+    """Load a page in the browser, timing it under the given source."""
+    with timed_page_load(source):
+        driver.get(url)
 
 # Function to fetch company data by CNPJ
+@cached("cnpj", should_cache=_has_value)
+@single_flight("cnpj", key=normalize_cnpj)
+@instrument("cnpj")
 def fetch_cnpj_data(cnpj):
-    url = f"https://www.receitaws.com.br/v1/cnpj/{cnpj}"
+    # Use the local open-data registry when enabled, falling back to ReceitaWS
+    if REGISTRY_BACKEND == "local" and local_registry.available():
+        cnpj_data = local_registry.lookup(cnpj)
+        if cnpj_data is not None:
+            return cnpj_data
+    return fetch_receitaws_data(cnpj)
+
+# Function to fetch company data by CNPJ from the ReceitaWS API
+@limited("www.receitaws.com.br")
+def fetch_receitaws_data(cnpj):
+    url = f"{RECEITAWS_URL}/{cnpj}"
     try:
-        response = requests.get(url, verify=False)
+        response = http_client.get(url, verify=False)
 
+        # Throttling (HTTP 429) is retried by the shared rate limiter
         if response.status_code == 200:
             return response.json()
-        elif response.status_code == 429:
-            retry_after = int(response.headers.get("Retry-After", 30))
-            print(f"Waiting {retry_after} seconds before retrying...")
-            time.sleep(retry_after)
-            return fetch_cnpj_data(cnpj)
         else:
+            mark_outcome("not_found" if response.status_code == 404 else "error")
             return {"error": f"Unable to fetch CNPJ data: {response.status_code}"}
     except Exception as e:
+        mark_outcome(outcome_for(e))
         return {"error": f"An unexpected error occurred: {str(e)}"}
 
-# Function to fetch complaints and reputation on Reclame Aqui
-def fetch_reputation(company_name):
-    driver = manager.get_driver()
+def _find_key(data, key):
+    """Return the first value stored under 'key' in a nested JSON document."""
+    if isinstance(data, dict):
+        if key in data:
+            return data[key]
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None
+    for child in children:
+        value = _find_key(child, key)
+        if value is not None:
+            return value
+    return None
 
-    def try_fetch(url):
-        try:
-            driver.get(url)
-            ratings = driver.find_elements(By.CLASS_NAME, "go3621686408")
-            ratings_text = [rating.text for rating in ratings]
-            if ratings_text:
-                return float(ratings_text[0].split('/')[0])
-            else:
-                return np.nan
-        except (NoSuchElementException, TimeoutException):
-            return np.nan
-        except Exception as e:
+def fetch_reputation_http(company_name):
+    """
+    Reads the Reclame Aqui rating from the data payload embedded in the company page.
+
+    Args:
+        company_name (str): The company's slug on Reclame Aqui.
+
+    Returns:
+        float: The rating, or NaN if the company page does not exist.
+
+    Raises:
+        Exception: If the page cannot be fetched or parsed, so the caller can fall back to the browser.
+    """
+    response = http_client.get(
+        f"{RECLAMEAQUI_URL}/{company_name}/",
+        headers={"User-Agent": BROWSER_USER_AGENT, "Accept": "text/html"},
+    )
+    if response.status_code == 404:
+        return np.nan
+    response.raise_for_status()
+
+    match = NEXT_DATA_PATTERN.search(response.text)
+    if not match:
+        raise ValueError("Embedded data payload not found on the Reclame Aqui page.")
+    score = _find_key(json.loads(match.group(1)), "finalScore")
+    if score is None:
+        raise ValueError("Rating not found in the Reclame Aqui data payload.")
+    return float(score)
+
+def fetch_reputation_browser(company_name, driver):
+    """
+    Reads the Reclame Aqui rating from the rendered company page.
+
+    Returns:
+        float: The rating, NaN if the page shows none, or None if the page
+            could not be loaded.
+    """
+    try:
+        load_page(driver, f"{RECLAMEAQUI_URL}/{company_name}/", "reputation")
+        ratings = driver.find_elements(By.CLASS_NAME, "go3621686408")
+        ratings_text = [rating.text for rating in ratings]
+        if ratings_text:
+            return float(ratings_text[0].split('/')[0])
+        else:
             return np.nan
+    except NoSuchElementException:
+        return np.nan
+    except Exception as e:
+        mark_outcome(outcome_for(e))
+        return None
 
-    # First attempt with the original name
-    search_url = f"https://www.reclameaqui.com.br/empresa/{company_name}/"
-    rating = try_fetch(search_url)
+# Function to fetch complaints and reputation on Reclame Aqui
+@cached("reputation", should_cache=_has_value)
+@single_flight("reputation", key=name_key)
+@instrument("reputation")
+@limited("www.reclameaqui.com.br")
+def fetch_reputation(company_name, cnpj=None):
+    """
+    Fetches the rating of a company on Reclame Aqui.
 
-    # If not found, try without hyphens
-    if np.isnan(rating) and '-' in company_name:
-        search_url_alternate = f"https://www.reclameaqui.com.br/empresa/{company_name.replace('-', '')}/"
-        rating = try_fetch(search_url_alternate)
+    Args:
+        company_name (str): The company's slug on Reclame Aqui.
+        cnpj (str): The company's CNPJ, used to reuse the slug resolved in previous lookups.
 
-    # Return 0 if reputation could not be fetched
-    return rating if not np.isnan(rating) else 0
+    Returns:
+        float: The rating, 0 if the company was not found, or None if Reclame
+            Aqui could not be queried.
+    """
+    # Reuse the slug that resolved for this CNPJ before, if any
+    found, handle = handle_index.get(cnpj, "reputation")
+    if found and handle is None:
+        mark_outcome("not_found")
+        return 0
+    if found:
+        candidates = [handle]
+    else:
+        # Try the original name first, then without hyphens
+        candidates = [company_name]
+        if '-' in company_name:
+            candidates.append(company_name.replace('-', ''))
+
+    rating = None
+    candidate = None
+    if REPUTATION_FETCH_MODE in ("http-first", "http"):
+        try:
+            for candidate in candidates:
+                rating = fetch_reputation_http(candidate)
+                if not np.isnan(rating):
+                    break
+        except Exception as e:
+            rating = None
+            if REPUTATION_FETCH_MODE == "http":
+                mark_outcome(outcome_for(e))
+                return None
+            print(f"Reclame Aqui HTTP lookup failed, falling back to the browser: {e}")
+
+    # Only a 404 over HTTP tells for sure that the page does not exist
+    resolved_over_http = rating is not None
+
+    # Render the page in the browser only when the HTTP path is disabled or failed
+    if rating is None:
+        with get_pool("reputation").driver() as manager:
+            driver = manager.get_driver()
+            for candidate in candidates:
+                rating = fetch_reputation_browser(candidate, driver)
+                if rating is None or not np.isnan(rating):
+                    break
+        if rating is None:
+            # The page could not be loaded; the outcome is already recorded
+            return None
+
+    # Return 0 if the company was not found
+    if np.isnan(rating):
+        if resolved_over_http:
+            handle_index.set(cnpj, "reputation", None)
+        mark_outcome("not_found")
+        return 0
+    handle_index.set(cnpj, "reputation", candidate)
+    return rating
 
 # Function to log in to the "pesquisaprotesto.com.br" website
-def pesquisaprotesto_login():
-    driver = manager.get_driver()
+def pesquisaprotesto_login(driver):
     username = os.getenv("PESQUISAPROTESTO_USER")
     password = os.getenv("PESQUISAPROTESTO_PASSWORD")
 
     try:
-        driver.get("https://www.pesquisaprotesto.com.br/login")
+        load_page(driver, f"{PESQUISAPROTESTO_URL}/login", "protests")
         wait = WebDriverWait(driver, 5)
 
         # Fill in username
@@ -174,8 +491,7 @@ def pesquisaprotesto_login():
         raise RuntimeError(f"Error during login: {str(e)}")
 
 # Function to check if the user is logged in
-def is_logged_in():
-    driver = manager.get_driver()
+def is_logged_in(driver):
     try:
         user_button = WebDriverWait(driver, 5).until(
             EC.visibility_of_element_located((By.ID, "__BVID__67__BV_toggle_"))
@@ -184,8 +500,7 @@ def is_logged_in():
     except Exception:
         return False
     
-def check_recaptcha():
-    driver = manager.get_driver()
+def check_recaptcha(driver):
     try:
         wait = WebDriverWait(driver, 5)
         # Wait until the iframe is present in the DOM and accessible
@@ -208,48 +523,255 @@ def check_recaptcha():
     except:
         return False
 
+def _drain_network_log(driver):
+    """Discard the performance log entries captured so far."""
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+def _captured_json_responses(driver, domain=None):
+    """
+    Yield the JSON bodies of the API responses captured since the last drain.
+
+    A URL requested more than once (e.g. a search submitted again after a
+    reCAPTCHA) only yields its last response, so its results are not counted twice.
+    """
+    # The search API may be served from another subdomain of the site
+    domain = domain or urlparse(PESQUISAPROTESTO_URL).hostname.removeprefix("www.")
+    request_ids = {}
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"]).get("message", {})
+        if message.get("method") != "Network.responseReceived":
+            continue
+        response = message["params"]["response"]
+        if "json" not in response.get("mimeType", "") or domain not in response.get("url", ""):
+            continue
+        request_ids.pop(response["url"], None)
+        request_ids[response["url"]] = message["params"]["requestId"]
+
+    for request_id in request_ids.values():
+        try:
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            if body.get("base64Encoded"):
+                continue
+            yield json.loads(body["body"])
+        except Exception:
+            # The body may have been evicted from the browser's buffer
+            continue
+
+def _parse_amount(value):
+    """
+    Convert an API amount, either a number or a Brazilian-formatted string
+    like '1.234,56' or '1.250', to float.
+
+    In a string, '.' is always a thousands separator and ',' the decimal one.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r"[^\d,.-]", "", str(value))
+    text = text.replace(".", "").replace(",", ".")
+    return float(text or 0)
 
+def _sum_protests(data, totals):
+    """
+    Walk an API payload, adding up its protest counts and protested values.
+
+    Counts and values are only taken from the innermost objects that carry
+    one, so a notary office (or overall) total is not added on top of the
+    figures nested in it.
+
+    Returns:
+        tuple: Whether the payload, or any object nested in it, has a protest
+            count, and whether it has a protested value.
+    """
+    if isinstance(data, dict):
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return False, False
+
+    nested_count = nested_value = False
+    for child in children:
+        has_count, has_value = _sum_protests(child, totals)
+        nested_count = nested_count or has_count
+        nested_value = nested_value or has_value
+    if isinstance(data, list):
+        return nested_count, nested_value
+
+    has_count = nested_count
+    for key in PROTEST_COUNT_KEYS:
+        if key in data:
+            if not nested_count:
+                totals["count"] += int(data[key] or 0)
+                totals["found"] = True
+            has_count = True
+            break
+    has_value = nested_value
+    for key in PROTEST_VALUE_KEYS:
+        if key in data:
+            if not nested_value:
+                totals["value"] += _parse_amount(data[key])
+                totals["found"] = True
+            has_value = True
+            break
+    return has_count, has_value
+
+def extract_protests_bulk(driver):
+    """
+    Read the protest details of a search in one pass, from the API responses
+    captured by the browser, instead of opening each 'Detalhes' modal.
+
+    Returns:
+        tuple: The total number of protests and the total protested value, or
+        None if the captured responses do not carry the details.
+    """
+    totals = {"count": 0, "value": 0.0, "found": False}
+    try:
+        for payload in _captured_json_responses(driver):
+            _sum_protests(payload, totals)
+    except Exception as e:
+        print(f"Could not read the captured protest responses: {e}")
+        return None
+    if not totals["found"]:
+        return None
+    return totals["count"], totals["value"]
+
+def extract_protests_modal(driver, pacing):
+    """
+    Read the protest details by opening the 'Detalhes' modal of each notary office.
+
+    Returns:
+        tuple: The total number of protests and the total protested value.
+    """
+    total_protests = 0
+    total_protested_value = 0.0
+
+    count_locator = (By.XPATH, "//p[b[text()='Quantidade de protestos:']]")
+    wait = pacing.wait(driver, 5)
+    tables = driver.find_elements(By.XPATH, "//table[@role='table']")
+    for table in tables:
+        rows = table.find_elements(By.XPATH, ".//tbody/tr")
+        for row in rows:
+            details_button = wait.until(EC.element_to_be_clickable(
+                row.find_element(By.XPATH, ".//button[text()='Detalhes']")
+            ))
+            details_button.click()
+
+            # Wait for the modal to open
+            protest_count = wait.until(EC.visibility_of_element_located(count_locator))
+            protest_count_value = int(protest_count.text.split(':')[1].strip() if protest_count else 0)
+            total_protests += protest_count_value
+
+            protested_values = wait.until(EC.presence_of_all_elements_located((By.XPATH, "//div[@class='list-group']//p[b[text()='Valor Protestado: ']]")))
+
+            for item in protested_values:
+                numbers = re.findall(r'\d+[.]?\d*', item.text)
+                if numbers:
+                    value = float(numbers[0].replace('.', '').replace(',', '.')) + (float(numbers[1]) / 100)
+                    total_protested_value += value
+
+            close_button = driver.find_element(By.XPATH, '//button[@type="button" and @aria-label="Close"]')
+            close_button.click()
+            # Wait for the modal to close, so the next row does not read its stale content
+            wait.until(EC.invisibility_of_element_located(count_locator))
+
+    return total_protests, total_protested_value
+
+@cached("protests", should_cache=_has_value)
+@single_flight("protests", key=normalize_cnpj)
+@instrument("protests")
+@limited("www.pesquisaprotesto.com.br")
 def pesquisaprotesto_search_protests(cnpj):
     """
     Searches for protests on the 'pesquisaprotesto.com.br' website for the provided CNPJ.
     """
+    with get_pool("protests").driver() as manager:
+        return _search_protests(manager, cnpj)
+
+def refresh_pesquisaprotesto_session():
+    """
+    Renew the stored pesquisaprotesto session with a pooled browser.
+
+    A session that is still logged in is saved again, which extends its
+    expiry; otherwise a new login is performed.
+    """
+    with get_pool("protests").driver() as manager:
+        driver = manager.get_driver()
+        pesquisaprotesto_session.apply(driver)
+        seen_version = pesquisaprotesto_session.version
+        load_page(driver, f"{PESQUISAPROTESTO_URL}/servico/consulta-documento", "protests")
+        if is_logged_in(driver):
+            pesquisaprotesto_session.save(driver)
+        else:
+            print("Logging in to pesquisaprotesto.com.br to renew the session")
+            pesquisaprotesto_session.renew(driver, pesquisaprotesto_login, seen_version)
+
+def keep_pesquisaprotesto_session(interval, max_backoff=PESQUISAPROTESTO_SESSION_MAX_BACKOFF):
+    """
+    Renew the stored pesquisaprotesto session whenever it gets close to its expiry, forever.
+
+    Only a session stored by an earlier login is renewed, so no browser is
+    started until a search or the warm-up first logs in. After a failed
+    renewal, the wait doubles up to max_backoff seconds.
+    """
+    failures = 0
+    while True:
+        if pesquisaprotesto_session.version and not pesquisaprotesto_session.is_fresh():
+            try:
+                refresh_pesquisaprotesto_session()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"Error refreshing the pesquisaprotesto session: {e}")
+        time.sleep(min(interval * 2 ** failures, max(interval, max_backoff)))
+
+def click_consultar(driver, wait):
+    """Submit the protest search, discarding the responses of any earlier submission in the bulk mode."""
+    consultar_button = wait.until(EC.element_to_be_clickable((By.CLASS_NAME, "bt-consultar")))
+    # Only the responses of this search are read back in the bulk mode
+    if PROTEST_EXTRACTION_MODE == "bulk":
+        _drain_network_log(driver)
+    driver.execute_script("arguments[0].click();", consultar_button)
+
+def _search_protests(manager, cnpj):
+    """Runs the protest search on a driver checked out from the pool."""
     driver = manager.get_driver()
+    pacing = PacingPolicy()
+    # Restore the shared session if another browser renewed it
+    pesquisaprotesto_session.apply(driver)
+    seen_version = pesquisaprotesto_session.version
     # URL for the document consultation page
-    consulta_url = "https://www.pesquisaprotesto.com.br/servico/consulta-documento"
+    consulta_url = f"{PESQUISAPROTESTO_URL}/servico/consulta-documento"
     # Access the consultation page
-    driver.get(consulta_url)
-
-    time.sleep(random.uniform(1, 5))
+    load_page(driver, consulta_url, "protests")
+    pacing.wait_until_ready(driver)
 
     # Check if the user is logged in
-    if not is_logged_in():
-        print("User is not logged in, performing login on pesquisaprotesto.com.br")
-        pesquisaprotesto_login()
+    if not is_logged_in(driver):
+        print("User is not logged in, renewing the pesquisaprotesto.com.br session")
+        pesquisaprotesto_session.renew(driver, pesquisaprotesto_login, seen_version)
         # Access the consultation page
-        driver.get(consulta_url)
-    
+        load_page(driver, consulta_url, "protests")
+        pacing.wait_until_ready(driver)
+
     try:
-        # Wait for the page to load
-        wait = WebDriverWait(driver, 5)
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        wait = pacing.wait(driver, 5)
 
         formatted_cnpj = format_cnpj(cnpj)
         # Locate the CPF/CNPJ field and fill it with the formatted CNPJ
-        cnpj_input = wait.until(EC.presence_of_element_located((By.ID, "cpf_cnpj")))
+        cnpj_input = wait.until(EC.element_to_be_clickable((By.ID, "cpf_cnpj")))
         cnpj_input.clear()
-        for char in formatted_cnpj:
-            cnpj_input.send_keys(char)
-            time.sleep(random.uniform(0.1, 0.5))
+        cnpj_input.send_keys(formatted_cnpj)
+        pacing.pause()
 
         # Locate the "Consultar" button and click it
-        consultar_button = wait.until(EC.element_to_be_clickable((By.CLASS_NAME, "bt-consultar")))
-        driver.execute_script("arguments[0].click();", consultar_button)
-
-        time.sleep(random.uniform(1, 5))
+        click_consultar(driver, wait)
 
         try:
             # Wait for the search results
-            wait = WebDriverWait(driver, 10)
+            wait = pacing.wait(driver)
             result_text = wait.until(
                 EC.presence_of_element_located((
                     By.XPATH, "//div[@class='alert alert-light shadow-sm mb-5 cardCel']"
@@ -258,11 +780,9 @@ def pesquisaprotesto_search_protests(cnpj):
         except:
             try:
                 # Locate the "Consultar" button and click it
-                consultar_button = wait.until(EC.element_to_be_clickable((By.CLASS_NAME, "bt-consultar")))
-                driver.execute_script("arguments[0].click();", consultar_button)
-                time.sleep(random.uniform(1, 5))
+                click_consultar(driver, wait)
                 # Aguardar o resultado da busca
-                wait = WebDriverWait(driver, 10)
+                wait = pacing.wait(driver)
                 result_text = wait.until(
                     EC.presence_of_element_located((
                         By.XPATH, "//div[@class='alert alert-light shadow-sm mb-5 cardCel']"
@@ -271,9 +791,9 @@ def pesquisaprotesto_search_protests(cnpj):
             except:
                 print("\nResolving reCAPTCHA...")
                 try:
-                    solver.solve_recaptcha(driver)
+                    get_solver().solve_recaptcha(driver)
                     # Wait for the search results
-                    wait = WebDriverWait(driver, 10)
+                    wait = pacing.wait(driver)
                     result_text = wait.until(
                         EC.presence_of_element_located((
                             By.XPATH, "//div[@class='alert alert-light shadow-sm mb-5 cardCel']"
@@ -282,45 +802,26 @@ def pesquisaprotesto_search_protests(cnpj):
                 except:
                     manager.restart_driver()
                     # Retry the search process from the beginning
-                    return pesquisaprotesto_search_protests(cnpj)
+                    return _search_protests(manager, cnpj)
 
         # Extract and return the result text
         search_result = result_text.text.split(f'\n')[0]
 
-        time.sleep(random.uniform(1, 5))
+        pacing.pause()
 
         # Scroll down the page
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
 
         if search_result == 'Constam protestos nos cartórios participantes do Brasil':
-            # Logic to handle protest details, aggregating quantities and values
-            total_protests = 0
-            total_protested_value = 0.0
-
-            tables = driver.find_elements(By.XPATH, "//table[@role='table']")
-            for table in tables:
-                rows = table.find_elements(By.XPATH, ".//tbody/tr")
-                for row in rows:
-                    details_button = row.find_element(By.XPATH, ".//button[text()='Detalhes']")
-                    details_button.click()
-                    time.sleep(random.uniform(1, 5))
-
-                    wait = WebDriverWait(driver, 5)
-                    protest_count = wait.until(EC.presence_of_element_located((By.XPATH, "//p[b[text()='Quantidade de protestos:']]")))
-                    protest_count_value = int(protest_count.text.split(':')[1].strip() if protest_count else 0)
-                    total_protests += protest_count_value
-
-                    protested_values = wait.until(EC.presence_of_all_elements_located((By.XPATH, "//div[@class='list-group']//p[b[text()='Valor Protestado: ']]")))
-
-                    for item in protested_values:
-                        numbers = re.findall(r'\d+[.]?\d*', item.text)
-                        if numbers:
-                            value = float(numbers[0].replace('.', '').replace(',', '.')) + (float(numbers[1]) / 100)
-                            total_protested_value += value
-
-                    close_button = driver.find_element(By.XPATH, '//button[@type="button" and @aria-label="Close"]')
-                    close_button.click()
-                    time.sleep(random.uniform(1, 5))
+            # Aggregate the quantities and values of the protest details
+            totals = None
+            if PROTEST_EXTRACTION_MODE == "bulk":
+                with span("extract_protests", mode="bulk"):
+                    totals = extract_protests_bulk(driver)
+            if totals is None:
+                with span("extract_protests", mode="modal"):
+                    totals = extract_protests_modal(driver, pacing)
+            total_protests, total_protested_value = totals
         else:
             # If no protests are found, set totals to zero
             total_protests = 0
@@ -330,75 +831,137 @@ def pesquisaprotesto_search_protests(cnpj):
         return total_protests, total_protested_value
     except Exception as e:
         print(f"Error occurred: {e}")
+        mark_outcome(outcome_for(e))
         return None
 
-def fetch_instagram_followers(company_name):
+def page_not_found(driver, network):
+    """Tell whether the loaded page shows the network's message for a profile that does not exist."""
+    try:
+        text = driver.find_element(By.TAG_NAME, "body").text
+    except Exception:
+        return False
+    text = text.replace("\u2019", "'").lower()
+    return any(message in text for message in PAGE_NOT_FOUND_MESSAGES[network])
+
+@cached("instagram", should_cache=_has_value)
+@single_flight("instagram", key=name_key)
+@instrument("instagram")
+@limited("www.instagram.com")
+def fetch_instagram_followers(company_name, cnpj=None):
     """
     Fetches the number of followers from the company's Instagram page based on its name.
     
     Args:
         company_name (str): The name of the company.
+        cnpj (str): The company's CNPJ, used to reuse the handle resolved in previous lookups.
 
     Returns:
         tuple: Instagram URL and the number of followers.
     """
-    driver = manager.get_driver()
-    url = f"https://www.instagram.com/{company_name.replace('-', '').replace('.', '').lower()}/"
+    found, handle = handle_index.get(cnpj, "instagram")
+    if found and handle is None:
+        mark_outcome("not_found")
+        return np.nan, np.nan
+    if not found:
+        handle = social_handle(company_name)
 
-    try:
-        driver.get(url)
-        wait = WebDriverWait(driver, 5)
+    with get_pool("instagram").driver() as manager:
+        driver = manager.get_driver()
+        url = f"{INSTAGRAM_URL}/{handle}/"
 
-        followers_element = wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//span[contains(@class, 'x5n08af') and @title]")
+        try:
+            load_page(driver, url, "instagram")
+            wait = WebDriverWait(driver, 5)
+
+            followers_element = wait.until(
+                EC.presence_of_element_located(
+                    (By.XPATH, "//span[contains(@class, 'x5n08af') and @title]")
+                )
             )
-        )
 
-        followers = followers_element.get_attribute("title")
-        return url, int(followers.replace('.', ''))
+            followers = followers_element.get_attribute("title")
+            handle_index.set(cnpj, "instagram", handle)
+            return url, int(followers.replace('.', ''))
 
-    except Exception:
-        return np.nan, np.nan
-
-def fetch_facebook_followers(company_name):
+        except TimeoutException:
+            # The followers count is also missing behind a login wall or on a
+            # slow load, so only a 'page not available' message is definitive
+            if page_not_found(driver, "instagram"):
+                handle_index.set(cnpj, "instagram", None)
+                mark_outcome("not_found")
+            else:
+                mark_outcome("timeout")
+            return np.nan, np.nan
+        except Exception as e:
+            mark_outcome(outcome_for(e))
+            return np.nan, np.nan
+
+@cached("facebook", should_cache=_has_value)
+@single_flight("facebook", key=name_key)
+@instrument("facebook")
+@limited("www.facebook.com")
+def fetch_facebook_followers(company_name, cnpj=None):
     """
     Fetches the number of followers from the company's Facebook page based on its name.
 
     Args:
         company_name (str): The name of the company.
+        cnpj (str): The company's CNPJ, used to reuse the handle resolved in previous lookups.
 
     Returns:
         tuple: Facebook URL and the number of followers.
     """
-    driver = manager.get_driver()
-    url = f"https://www.facebook.com/{company_name.replace('-', '').replace('.', '').lower()}/"
+    found, handle = handle_index.get(cnpj, "facebook")
+    if found and handle is None:
+        mark_outcome("not_found")
+        return np.nan, np.nan
+    if not found:
+        handle = social_handle(company_name)
 
-    try:
-        driver.get(url)
-        wait = WebDriverWait(driver, 5)
+    with get_pool("facebook").driver() as manager:
+        driver = manager.get_driver()
+        url = f"{FACEBOOK_URL}/{handle}/"
 
         try:
-            wait.until(
-                EC.visibility_of_element_located((By.ID, "login_popup_cta_form"))
-            )
-            close_button = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, "//div[@aria-label='Fechar' and @role='button']"))
-            )
-            close_button.click()
-        except Exception:
-            pass
+            load_page(driver, url, "facebook")
+            wait = WebDriverWait(driver, 5)
 
-        followers_element = wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//a[contains(@class, 'x1i10hfl') and contains(text(), 'seguidores')]")
+            try:
+                wait.until(
+                    EC.visibility_of_element_located((By.ID, "login_popup_cta_form"))
+                )
+                close_button = WebDriverWait(driver, 5).until(
+                    EC.element_to_be_clickable((By.XPATH, "//div[@aria-label='Fechar' and @role='button']"))
+                )
+                close_button.click()
+            except Exception:
+                pass
+
+            followers_element = wait.until(
+                EC.presence_of_element_located(
+                    (By.XPATH, "//a[contains(@class, 'x1i10hfl') and contains(text(), 'seguidores')]")
+                )
             )
-        )
 
-        return url, followers_element.text.split('seguidores ')[1]
-    except Exception:
-        return np.nan, np.nan
+            handle_index.set(cnpj, "facebook", handle)
+            return url, followers_element.text.split('seguidores ')[1]
+        except TimeoutException:
+            # The followers count is also missing behind a login wall or on a
+            # slow load, so only a 'page not available' message is definitive
+            if page_not_found(driver, "facebook"):
+                handle_index.set(cnpj, "facebook", None)
+                mark_outcome("not_found")
+            else:
+                mark_outcome("timeout")
+            return np.nan, np.nan
+        except Exception as e:
+            mark_outcome(outcome_for(e))
+            return np.nan, np.nan
 
+@cached("government_contracts", should_cache=_has_value)
+@single_flight("government_contracts", key=normalize_cnpj)
+@instrument("government_contracts")
+@limited("api.portaldatransparencia.gov.br")
 def fetch_government_contracts(cnpj):
     """
     Checks for contracts in the Transparency Portal for a given CPF or CNPJ.
@@ -407,9 +970,10 @@ def fetch_government_contracts(cnpj):
         cnpj (str): CPF or CNPJ to be queried.
 
     Returns:
-        bool: Whether the company has contracts with the government.
+        bool: Whether the company has contracts with the government, or None
+            if the Transparency Portal could not be queried.
     """
-    url = "https://api.portaldatransparencia.gov.br/api-de-dados/contratos/cpf-cnpj"
+    url = f"{PORTAL_TRANSPARENCIA_URL}/contratos/cpf-cnpj"
 
     headers = {
         "Accept": "application/json",
@@ -422,48 +986,164 @@ def fetch_government_contracts(cnpj):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, headers=headers, params=params)
         response.raise_for_status()
 
         data = response.json()
         return len(data) > 0
-    except:
-        return False
+    except Exception as e:
+        mark_outcome(outcome_for(e))
+        return None
 
-def fetch_company_data(cnpj):
+def run_sources(tasks, fan_out=True, on_source_complete=None):
     """
-    Fetches company data based on its CNPJ, including followers on social media and government contracts.
+    Runs independent data sources and collects a structured result for each one.
 
     Args:
-        cnpj (str): The company's CNPJ.
+        tasks (dict): Maps a source name to a tuple of (function, args, default),
+            where default is the value used when the source fails or times out.
+        fan_out (bool): Whether to run the sources concurrently, each one bounded
+            by its timeout in SOURCE_TIMEOUTS.
+        on_source_complete (callable): Called with the name, value and report of
+            each source as soon as it completes, fails or times out.
 
     Returns:
-        dict: Consolidated company data.
+        tuple: The value of each source and a status report with the outcome
+            ('ok', 'timeout' or 'error') and the elapsed time of each source.
     """
-    cnpj_data = fetch_cnpj_data(cnpj)
-    if cnpj_data['fantasia']:
-        raw_name = cnpj_data['fantasia']
-    else:
-        raw_name = cnpj_data['nome']
+    values, report = {}, {}
 
+    if not fan_out:
+        for name, (func, args, default) in tasks.items():
+            start = time.monotonic()
+            try:
+                values[name] = func(*args)
+                report[name] = {"status": "ok"}
+            except Exception as e:
+                values[name] = default
+                report[name] = {"status": "error", "error": str(e)}
+            report[name]["elapsed"] = round(time.monotonic() - start, 3)
+            if on_source_complete:
+                on_source_complete(name, values[name], report[name])
+        return values, report
+
+    start = time.monotonic()
+    futures = {
+        name: lane_executors[SOURCE_LANES.get(name, "http")].submit(propagate(func), *args)
+        for name, (func, args, _) in tasks.items()
+    }
+
+    # Every source has its own deadline, counted from the start of the fan-out.
+    # Sources are collected in the order they complete.
+    deadlines = {name: start + SOURCE_TIMEOUTS.get(name, 60) for name in futures}
+    pending = dict(futures)
+    while pending:
+        next_deadline = min(deadlines[name] for name in pending)
+        done, _ = wait(pending.values(), timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        for name, future in list(pending.items()):
+            default = tasks[name][2]
+            if future in done:
+                try:
+                    values[name] = future.result()
+                    report[name] = {"status": "ok"}
+                except Exception as e:
+                    values[name] = default
+                    report[name] = {"status": "error", "error": str(e)}
+            elif time.monotonic() >= deadlines[name]:
+                future.cancel()
+                values[name] = default
+                report[name] = {"status": "timeout"}
+            else:
+                continue
+            del pending[name]
+            report[name]["elapsed"] = round(time.monotonic() - start, 3)
+            if on_source_complete:
+                on_source_complete(name, values[name], report[name])
+
+    return values, report
+
+# Legal suffixes and filler words dropped from the company names
+REMOVE_WORDS_PATTERN = re.compile(
+    r'\b(comercio-de-medicamentos|ltda|eireli|me|sa|s\/a|epp|limitada|sociedade-anonima|com-br)\b',
+    re.IGNORECASE,
+)
+
+@lru_cache(maxsize=10000)
+def company_slug(raw_name):
+    """Turn a registered company name into the slug used to guess its pages, e.g. 'Foo Comercio Ltda' -> 'foo-comercio'."""
     raw_name = (
         unidecode(raw_name.lower())
         .replace(" ", "-")
         .replace(",", "")
         .replace("+", "mais")
     )
+    return REMOVE_WORDS_PATTERN.sub('', raw_name).strip('-')
 
-    remove_words = r'\b(comercio-de-medicamentos|ltda|eireli|me|sa|s\/a|epp|limitada|sociedade-anonima|com-br)\b'
-    company_name = re.sub(remove_words, '', raw_name, flags=re.IGNORECASE).strip('-')
+@lru_cache(maxsize=10000)
+def social_handle(company_name):
+    """Guess the Instagram and Facebook handle of a company from its slug."""
+    return company_name.replace('-', '').replace('.', '').lower()
 
-    total_protests, total_protested_value = pesquisaprotesto_search_protests(cnpj)
-    government_contracts = fetch_government_contracts(cnpj)
-    last_update = datetime.strptime(cnpj_data['ultima_atualizacao'], '%Y-%m-%dT%H:%M:%S.%fZ').strftime('%d/%m/%Y')
+@single_flight("company_data", key=normalize_cnpj)
+def fetch_company_data(cnpj, fan_out=None, refresh=False, on_source_complete=None):
+    """
+    Fetches company data based on its CNPJ, including followers on social media and government contracts.
+
+    Once the ReceitaWS record resolves the company name, the remaining sources are
+    independent of each other. In fan-out mode they run concurrently, so the total
+    latency approaches that of the slowest source; a source that fails or exceeds
+    its timeout leaves its fields empty and is flagged in 'sources'. Concurrent
+    calls for the same CNPJ share a single run.
+
+    Args:
+        cnpj (str): The company's CNPJ.
+        fan_out (bool): Run the sources concurrently. Defaults to COMPANY_DATA_FAN_OUT.
+        refresh (bool): Ignore cached results and fetch every source again.
+        on_source_complete (callable): Called with the name, value and report of
+            each source as soon as it is available, including the 'cnpj' registry lookup.
+
+    Returns:
+        dict: Consolidated company data, with its credit score and risk band.
+    """
+    if fan_out is None:
+        fan_out = COMPANY_DATA_FAN_OUT
 
-    url_insta, followers_insta = fetch_instagram_followers(company_name)
-    url_facebook, followers_facebook = fetch_facebook_followers(company_name)
+    cnpj_data = fetch_cnpj_data(cnpj, refresh=refresh)
+    if on_source_complete:
+        on_source_complete("cnpj", cnpj_data, {"status": "error" if "error" in cnpj_data else "ok"})
+    if "error" in cnpj_data:
+        return cnpj_data
 
-    return {
+    if cnpj_data['fantasia']:
+        raw_name = cnpj_data['fantasia']
+    else:
+        raw_name = cnpj_data['nome']
+
+    company_name = company_slug(raw_name)
+
+    last_update = datetime.strptime(cnpj_data['ultima_atualizacao'], '%Y-%m-%dT%H:%M:%S.%fZ').strftime('%d/%m/%Y')
+
+    with span("sources", fan_out=fan_out):
+        values, report = run_sources({
+            "protests": (partial(pesquisaprotesto_search_protests, refresh=refresh), (cnpj,), None),
+            "government_contracts": (partial(fetch_government_contracts, refresh=refresh), (cnpj,), None),
+            "instagram": (partial(fetch_instagram_followers, refresh=refresh, cnpj=cnpj), (company_name,), (np.nan, np.nan)),
+            "facebook": (partial(fetch_facebook_followers, refresh=refresh, cnpj=cnpj), (company_name,), (np.nan, np.nan)),
+        }, fan_out=fan_out, on_source_complete=on_source_complete)
+
+    if values["protests"] is None:
+        total_protests, total_protested_value = np.nan, np.nan
+        if report["protests"]["status"] == "ok":
+            report["protests"]["status"] = "error"
+    else:
+        total_protests, total_protested_value = values["protests"]
+    government_contracts = values["government_contracts"]
+    if government_contracts is None and report["government_contracts"]["status"] == "ok":
+        report["government_contracts"]["status"] = "error"
+    url_insta, followers_insta = values["instagram"]
+    url_facebook, followers_facebook = values["facebook"]
+
+    company_data = {
         'cnpj': cnpj,
         'name': company_name,
         'state': cnpj_data['uf'],
@@ -481,5 +1161,9 @@ def fetch_company_data(cnpj):
         'instagram_url': url_insta,
         'instagram_followers': followers_insta,
         'facebook_url': url_facebook,
-        'facebook_followers': followers_facebook
-    }
\ No newline at end of file
+        'facebook_followers': followers_facebook,
+    }
+    with span("score"):
+        company_data['score'], company_data['risk_band'] = score_record(company_data)
+    company_data['sources'] = report
+    return company_data
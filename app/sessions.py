@@ -0,0 +1,126 @@
+import json
+import os
+import pickle
+import threading
+import time
+import weakref
+from .tracing import span
+
+class SessionStore:
+    """
+    A persisted browser session (cookies and localStorage) shared by pooled drivers.
+
+    The session is captured once after a login and saved to disk, so it
+    survives restarts. Each driver restores it on its first use, and again
+    whenever another driver has logged in since. Only one login runs at a time.
+    """
+
+    def __init__(self, url, path, ttl, refresh_margin):
+        """
+        Args:
+            url (str): Page of the site the session belongs to, loaded before restoring it.
+            path (str): File where the session is persisted.
+            ttl (float): Assumed lifetime of a session, in seconds.
+            refresh_margin (float): How long before the expiry the session is renewed.
+        """
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._state = None
+        self._loaded = False
+        self._lock = threading.RLock()
+        # Version of the session last restored in each driver
+        self._applied = weakref.WeakKeyDictionary()
+
+    def _load(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                with open(self.path, "rb") as file:
+                    self._state = pickle.load(file)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error loading session '{self.path}': {e}")
+        return self._state
+
+    @property
+    def version(self):
+        state = self._load()
+        return state["version"] if state else 0
+
+    def expires_in(self):
+        """Seconds until the session expires (negative if expired or missing)."""
+        state = self._load()
+        if not state:
+            return -1
+        return state["expires_at"] - time.time()
+
+    def is_fresh(self):
+        """Whether the session exists and is not due for renewal."""
+        return self.expires_in() > self.refresh_margin
+
+    def save(self, driver):
+        """Capture the session of a logged-in driver and persist it."""
+        with self._lock:
+            local_storage = driver.execute_script("return JSON.stringify(Object.assign({}, window.localStorage));")
+            state = {
+                "cookies": driver.get_cookies(),
+                "local_storage": json.loads(local_storage or "{}"),
+                "expires_at": time.time() + self.ttl,
+                "version": self.version + 1,
+            }
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "wb") as file:
+                pickle.dump(state, file)
+            os.replace(temp_path, self.path)
+            self._state = state
+            self._applied[driver] = state["version"]
+            print("Session successfully saved.")
+
+    def apply(self, driver):
+        """
+        Restore the stored session in a driver, unless it already has the latest one.
+
+        Returns:
+            bool: Whether the session was restored.
+        """
+        state = self._load()
+        if not state or self._applied.get(driver) == state["version"]:
+            return False
+        driver.get(self.url)
+        driver.delete_all_cookies()
+        for cookie in state["cookies"]:
+            cookie = dict(cookie)
+            cookie.pop("sameSite", None)
+            try:
+                driver.add_cookie(cookie)
+            except Exception as e:
+                print(f"Error restoring cookie '{cookie.get('name')}': {e}")
+        driver.execute_script(
+            "for (const [key, value] of Object.entries(arguments[0])) { window.localStorage.setItem(key, value); }",
+            state["local_storage"],
+        )
+        self._applied[driver] = state["version"]
+        return True
+
+    def renew(self, driver, login, seen_version=None):
+        """
+        Log in with a driver and store the new session.
+
+        If another driver already renewed the session since 'seen_version',
+        that session is restored instead of logging in again.
+
+        Args:
+            driver: The WebDriver to log in with.
+            login (callable): Function performing the login on the driver.
+            seen_version (int): Session version the caller found to be invalid.
+        """
+        with self._lock:
+            if seen_version is not None and self.version != seen_version and self.is_fresh():
+                self.apply(driver)
+                return
+            with span("session_login", url=self.url):
+                login(driver)
+            self.save(driver)
@@ -0,0 +1,64 @@
+import json
+import threading
+from functools import wraps
+from .metrics import COALESCED_CALLS
+
+class _Call:
+    """An in-flight call, awaited by the callers that joined it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def single_flight(source, key=None):
+    """
+    Share one in-flight call among concurrent identical calls.
+
+    While a call is running, callers with the same arguments wait for it and
+    receive its result (or its exception) instead of starting their own.
+    Nothing is kept once the call completes; caching is left to @cached.
+
+    Args:
+        source (str): Name of the source, used in the metrics.
+        key (callable): Normalizes the first argument (e.g. a CNPJ or a company
+            name), so differently formatted values share the same call. The
+            function is called with the normalized value.
+    """
+    def decorator(func):
+        calls = {}
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # The call runs with the normalized value, so every caller sharing
+            # it gets a result that is valid for its own input
+            if key and args:
+                args = (key(args[0]), *args[1:])
+            call_key = json.dumps([list(args), kwargs], sort_keys=True, default=str)
+
+            with lock:
+                call = calls.get(call_key)
+                leader = call is None
+                if leader:
+                    call = calls[call_key] = _Call()
+
+            if not leader:
+                COALESCED_CALLS.inc(source=source)
+                call.done.wait()
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+            try:
+                call.result = func(*args, **kwargs)
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with lock:
+                    del calls[call_key]
+                call.done.set()
+        return wrapper
+    return decorator
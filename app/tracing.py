@@ -0,0 +1,281 @@
+"""
+Opt-in tracing of a request: a timeline of spans and an optional cProfile dump.
+
+A trace is active in a context variable for the duration of a request. Code
+wraps its phases in span() blocks, which cost a single lookup when no trace is
+active. Work handed to other threads joins the trace through propagate(), and
+the WebDriver commands of a traced request are recorded by trace_driver().
+"""
+from contextlib import contextmanager
+import contextvars
+import cProfile
+from functools import wraps
+import io
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+
+# Trace every request (TRACE_REQUESTS=1) instead of only those asking for it with ?trace=1
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "0") == "1"
+# Also profile every traced request with cProfile, as with ?profile=1
+TRACE_PROFILE = os.getenv("TRACE_PROFILE", "0") == "1"
+# Where the timeline and the profile of each trace are written ('' disables it)
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+# Spans kept per trace; a long WebDriverWait polls many commands
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 5000))
+# Functions listed in the profile summary of a response
+PROFILE_TOP_FUNCTIONS = 25
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Trace:
+    """
+    The spans recorded while handling one request.
+
+    Each span has a name, a parent, a start offset and a duration, in seconds
+    from the start of the trace, plus free-form attributes. With profiling on,
+    every thread working for the trace runs its own cProfile profiler, and the
+    profiles are merged when the trace is written.
+    """
+
+    def __init__(self, name, profile=False, max_spans=TRACE_MAX_SPANS):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.profile = profile
+        self.max_spans = max_spans
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def activate(self):
+        """Make this the trace of the current context; returns a token for deactivate()."""
+        return _current_trace.set(self)
+
+    def deactivate(self, token):
+        _current_trace.reset(token)
+
+    def next_span_id(self):
+        return next(self._ids)
+
+    def add_span(self, span):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def start_profiler(self):
+        """Profile the calling thread, if the trace is profiled; returns the profiler for stop_profiler()."""
+        if not self.profile:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running on this thread
+            return None
+        return profiler
+
+    def stop_profiler(self, profiler):
+        if profiler is None:
+            return
+        profiler.disable()
+        with self._lock:
+            self._profiles.append(profiler)
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = round(time.perf_counter() - self.start, 6)
+
+    def stats(self):
+        """Merge the profiles of every thread into a pstats.Stats, or None without profiling."""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        return stats
+
+    def summary(self):
+        """Total time and count of the spans of each name, slowest first."""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span["name"], {"count": 0, "total": 0.0})
+            total["count"] += 1
+            total["total"] += span["duration"]
+        return {
+            name: {"count": total["count"], "total": round(total["total"], 6)}
+            for name, total in sorted(totals.items(), key=lambda item: item[1]["total"], reverse=True)
+        }
+
+    def top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        """The profile's functions with the highest cumulative time, as text."""
+        stats = self.stats()
+        if stats is None:
+            return None
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+    def to_dict(self, include_profile=False):
+        self.finish()
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "summary": self.summary(),
+            "spans": sorted(self.spans, key=lambda span: span["start"]),
+        }
+        if self.dropped:
+            data["dropped_spans"] = self.dropped
+        if include_profile and self.profile:
+            data["profile"] = self.top_functions()
+        return data
+
+    def write(self, directory):
+        """
+        Write the trace to a directory.
+
+        Args:
+            directory (str): Destination directory, created if needed.
+
+        Returns:
+            list: Paths of the written files: '<id>.json' with the timeline in
+                the Chrome trace event format (opened by chrome://tracing or
+                ui.perfetto.dev) and, if profiled, '<id>.prof' with the merged
+                cProfile stats (read by pstats, snakeviz or flameprof).
+        """
+        self.finish()
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+
+        threads = {}
+        events = []
+        for span in self.spans:
+            tid = threads.setdefault(span["thread"], len(threads) + 1)
+            events.append({
+                "name": span["name"],
+                "ph": "X",
+                "ts": round(span["start"] * 1e6),
+                "dur": round(span["duration"] * 1e6),
+                "pid": 1,
+                "tid": tid,
+                "args": {key: value for key, value in span.items() if key not in ("name", "start", "duration", "thread")},
+            })
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}}
+            for thread, tid in threads.items()
+        )
+        path = os.path.join(directory, f"{self.id}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({
+                "traceEvents": events,
+                "displayTimeUnit": "ms",
+                "otherData": {"name": self.name, "started_at": self.started_at, "duration": self.duration},
+            }, file, default=str)
+        paths.append(path)
+
+        stats = self.stats()
+        if stats is not None:
+            path = os.path.join(directory, f"{self.id}.prof")
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
+
+def current_trace():
+    """Return the trace of the current context, or None when tracing is off."""
+    return _current_trace.get()
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Record the duration of a with block as a span of the current trace.
+
+    Yields the span's attributes, so the block can add some (e.g. a status
+    code) once known. Does nothing when no trace is active.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attributes
+        return
+
+    span_id = trace.next_span_id()
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.add_span({
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start": round(start - trace.start, 6),
+            "duration": round(time.perf_counter() - start, 6),
+            "thread": threading.current_thread().name,
+            **attributes,
+        })
+
+def propagate(func):
+    """
+    Bind a function to the current context, so that it joins the current trace
+    when run in another thread (e.g. submitted to an executor).
+
+    When the trace is profiled, the function also runs under its own profiler.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return func
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        profiler = trace.start_profiler()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            trace.stop_profiler(profiler)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.run(run, *args, **kwargs)
+    return wrapper
+
+def trace_driver(driver):
+    """
+    Record every command a WebDriver sends to the browser as a span.
+
+    WebElement calls go through the driver's execute() too, so clicks, finds
+    and the polls of a WebDriverWait all show up. Drivers are shared by the
+    pool, so the wrapper only records while a trace is active.
+    """
+    execute = driver.execute
+
+    def traced_execute(driver_command, params=None):
+        if _current_trace.get() is None:
+            return execute(driver_command, params)
+        attributes = {"command": driver_command}
+        if driver_command == "get" and params:
+            attributes["url"] = params.get("url")
+        with span(f"selenium {driver_command}", **attributes):
+            return execute(driver_command, params)
+
+    driver.execute = traced_execute
+    return driver
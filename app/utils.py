@@ -1,18 +1,58 @@
+import hashlib
+import json
 import os
 import platform
 import pickle
-import requests
+import re
+import shutil
+import subprocess
+import tempfile
 import zipfile
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from . import http_client
 
 # General Constants
 CHROMEDRIVER_DIR = "chromedriver"
+# Browser profiles. The lean profile skips what scraping never reads (images,
+# media, fonts and trackers), returns as soon as the DOM is ready and keeps a
+# small disk cache, so each browser loads pages faster and uses less memory.
+# Profiles that capture the network keep Chrome's performance log, so the
+# responses of the pages' backing APIs can be read back.
+BROWSER_PROFILES = {
+    "default": {
+        "block_resources": False,
+        "page_load_strategy": "normal",
+        "disk_cache_mb": None,
+        "capture_network": True,
+    },
+    "lean": {
+        "block_resources": True,
+        "page_load_strategy": "eager",
+        "disk_cache_mb": int(os.getenv("LEAN_DISK_CACHE_MB", 32)),
+        "capture_network": False,
+    },
+}
+
+# URL patterns blocked by the lean profile
+BLOCKED_URL_PATTERNS = [
+    # Images, media and fonts
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*",
+    "*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*",
+    "*.woff*", "*.woff2*", "*.ttf*", "*.otf*",
+    # Analytics and ad trackers
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*connect.facebook.net*", "*hotjar.com*",
+    "*clarity.ms*", "*nr-data.net*", "*newrelic.com*", "*taboola.com*", "*criteo.*",
+] + [pattern for pattern in os.getenv("BROWSER_BLOCKED_URLS", "").split(",") if pattern]
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
 
 # Driver Management
-def initialize_driver():
-    """Initialize the WebDriver with Chrome options."""
+def initialize_driver(driver_path=None, profile="default"):
+    """Initialize the WebDriver with Chrome options and the given browser profile."""
+    settings = BROWSER_PROFILES[profile]
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--disable-blink-features=AutomationControlled")
@@ -23,10 +63,27 @@ def initialize_driver():
     options.add_argument("--disable-web-security")
     options.add_argument("--profile-directory=Default")
     options.add_argument("--incognito")
-    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36")
-    driver_path = f"chromedriver/chromedriver-{get_os_type()}/chromedriver.exe" 
+    options.add_argument(f"--user-agent={BROWSER_USER_AGENT}")
+    options.page_load_strategy = settings["page_load_strategy"]
+    if settings["disk_cache_mb"]:
+        options.add_argument(f"--disk-cache-size={settings['disk_cache_mb'] * 1024 * 1024}")
+    if settings["block_resources"]:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--mute-audio")
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+        })
+    if settings["capture_network"]:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if driver_path is None:
+        driver_path = os.path.join(CHROMEDRIVER_DIR, f"chromedriver-{get_os_type()}", chromedriver_binary_name())
     service = Service(driver_path)
     driver = webdriver.Chrome(service=service, options=options)
+    if settings["block_resources"]:
+        # Drop the blocked requests before they leave the browser
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
     return driver
 
 def load_cookies(driver, file_path):
@@ -45,10 +102,22 @@ def load_cookies(driver, file_path):
         print(f"Error loading cookies: {e}")
 
 def save_cookies(driver, file_path):
-    """Save cookies from the browser session."""
+    """
+    Save cookies from the browser session.
+
+    The cookies are written to a temporary file that then replaces the old
+    one, so a browser starting meanwhile never reads a half-written file.
+    """
     try:
-        with open(file_path, "wb") as file:
-            pickle.dump(driver.get_cookies(), file)
+        cookies = driver.get_cookies()
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(cookies, file)
+            os.replace(temp_path, file_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
         print("Cookies successfully saved.")
     except Exception as e:
         print(f"Error saving cookies: {e}")
@@ -56,41 +125,58 @@ def save_cookies(driver, file_path):
 # ChromeDriver Management
 def get_chrome_version():
     """Retrieve the installed version of Google Chrome."""
+    system = platform.system().lower()
     try:
-        return os.popen(
-            r'reg query "HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon" /v version'
-        ).read().split()[-1]
+        if system == "windows":
+            return os.popen(
+                r'reg query "HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon" /v version'
+            ).read().split()[-1]
+
+        if system == "darwin":
+            candidates = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"]
+        else:
+            candidates = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+        for candidate in candidates:
+            executable = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+            if not executable:
+                continue
+            output = subprocess.run([executable, "--version"], capture_output=True, text=True, timeout=10).stdout
+            match = re.search(r"\d+\.\d+\.\d+\.\d+", output)
+            if match:
+                return match.group(0)
     except Exception:
-        raise RuntimeError("Unable to retrieve Chrome version.")
+        pass
+    raise RuntimeError("Unable to retrieve Chrome version.")
 
 def get_chromedriver_url(version):
     """Get the download URL for the corresponding ChromeDriver version."""
     major_version = version.split('.')[0]
-    response = requests.get(
+    response = http_client.get(
         "https://googlechromelabs.github.io/chrome-for-testing/known-good-versions-with-downloads.json",
         verify=False
     )
     if response.status_code == 200:
         data = response.json()
-        for entry in data["versions"]:
-            if entry["version"].startswith(major_version):
+        # Versions are listed in ascending order, prefer the latest build of the major version
+        for entry in reversed(data["versions"]):
+            if entry["version"].split('.')[0] == major_version:
                 os_type = get_os_type()
-                for download in entry["downloads"]["chromedriver"]:
+                for download in entry.get("downloads", {}).get("chromedriver", []):
                     if download["platform"] == os_type:
                         return download["url"]
     raise RuntimeError(f"Unable to find ChromeDriver for version {version}.")
 
-def update_chromedriver(url):
+def update_chromedriver(url, target_dir=CHROMEDRIVER_DIR):
     """Download and update ChromeDriver."""
-    os.makedirs(CHROMEDRIVER_DIR, exist_ok=True)
-    zip_path = os.path.join(CHROMEDRIVER_DIR, "chromedriver.zip")
-    response = requests.get(url, stream=True)
+    os.makedirs(target_dir, exist_ok=True)
+    zip_path = os.path.join(target_dir, "chromedriver.zip")
+    response = http_client.get(url, stream=True, timeout=(http_client.HTTP_CONNECT_TIMEOUT, 120))
     try:
         if response.status_code == 200:
             with open(zip_path, "wb") as file:
                 file.write(response.content)
             with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(CHROMEDRIVER_DIR)
+                zip_ref.extractall(target_dir)
             os.remove(zip_path)
             print("ChromeDriver successfully updated.")
         else:
@@ -98,10 +184,72 @@ def update_chromedriver(url):
     except Exception as e:
         print(f"Failed to update ChromeDriver: {e}")
 
+def chromedriver_binary_name():
+    """Name of the ChromeDriver executable on the current OS."""
+    return "chromedriver.exe" if platform.system().lower() == "windows" else "chromedriver"
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ensure_chromedriver(chrome_version):
+    """
+    Return the path of a ChromeDriver matching the installed Chrome, downloading it only if needed.
+
+    Drivers are cached under chromedriver/<major version>/ with a manifest holding
+    the download URL and the SHA-256 of the binary. When the cached binary
+    matches its manifest no network call is made.
+
+    Args:
+        chrome_version (str): Installed Chrome version, e.g. "131.0.6778.86".
+
+    Returns:
+        str: Path of the ChromeDriver executable.
+    """
+    major_version = chrome_version.split('.')[0]
+    os_type = get_os_type()
+    cache_dir = os.path.join(CHROMEDRIVER_DIR, major_version)
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    binary_path = os.path.join(cache_dir, f"chromedriver-{os_type}", chromedriver_binary_name())
+
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        if (
+            manifest.get("platform") == os_type
+            and os.path.exists(binary_path)
+            and _sha256(binary_path) == manifest.get("sha256")
+        ):
+            return binary_path
+        print("Cached ChromeDriver does not match its manifest, downloading it again...")
+    except (FileNotFoundError, ValueError):
+        pass
+
+    url = get_chromedriver_url(chrome_version)
+    update_chromedriver(url, cache_dir)
+    if not os.path.exists(binary_path):
+        raise RuntimeError(f"ChromeDriver not found at {binary_path} after download.")
+    if os_type != "win64":
+        os.chmod(binary_path, 0o755)
+
+    with open(manifest_path, "w") as file:
+        json.dump({
+            "chrome_major_version": major_version,
+            "platform": os_type,
+            "url": url,
+            "sha256": _sha256(binary_path),
+        }, file, indent=2)
+    return binary_path
+
 def get_os_type():
     """Identify the OS type for ChromeDriver compatibility."""
     system = platform.system().lower()
-    return {"windows": "win64", "linux": "linux64", "darwin": "mac64"}.get(system, None)
+    if system == "darwin":
+        return "mac-arm64" if platform.machine().lower() in ("arm64", "aarch64") else "mac-x64"
+    return {"windows": "win64", "linux": "linux64"}.get(system, None)
 
 def prompt_login(instagram_url, instagram_cookies_file):
     """Prompt user to log in and save cookies."""
@@ -119,4 +267,20 @@ def prompt_login(instagram_url, instagram_cookies_file):
     
 def format_cnpj(cnpj):
     """Formata o CNPJ no formato 00.000.000/0000-00"""
-    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
\ No newline at end of file
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+def normalize_cnpj(value):
+    """Strip the formatting of a CNPJ and pad it to 14 digits."""
+    return re.sub(r"\D", "", str(value)).zfill(14)
+
+def is_valid_cnpj(cnpj):
+    """Validate the length and the two check digits of a normalized CNPJ."""
+    if len(cnpj) != 14 or not cnpj.isdigit() or cnpj == cnpj[0] * 14:
+        return False
+    digits = [int(d) for d in cnpj]
+    for position in (12, 13):
+        weights = list(range(position - 7, 1, -1)) + list(range(9, 1, -1))
+        remainder = sum(d * w for d, w in zip(digits[:position], weights)) % 11
+        if digits[position] != (0 if remainder < 2 else 11 - remainder):
+            return False
+    return True
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Offline benchmarks of the service against local stand-ins of the upstreams.
+
+Measures fetch_company_data, the Flask routes and the main.py batch loop under
+a given concurrency, and reports the p50/p95/p99 latencies and the CNPJs
+processed per second. Nothing leaves the machine: every upstream URL points
+at the servers of benchmarks/upstreams.py, and the caches are disabled so each
+call does the full work.
+
+The browser-backed sources (protests, Instagram and Facebook) need a local
+Chrome and a ChromeDriver already in the chromedriver/ cache; pass --no-browser
+to measure only the HTTP-backed routes.
+
+Usage:
+    python -m benchmarks.run [--targets company-data,routes,batch] [--requests 50] [--concurrency 4]
+                             [--latency-ms 50] [--output results.json] [--baseline results.json]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import pickle
+import random
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from .upstreams import start_upstreams, upstream_environment
+
+ROUTES = {
+    "cnpj-data": lambda cnpj, name: f"/cnpj-data?cnpj={cnpj}",
+    "government-contracts": lambda cnpj, name: f"/government-contracts?cnpj={cnpj}",
+    "reputation": lambda cnpj, name: f"/reputation?company_name={name}",
+    "protests": lambda cnpj, name: f"/protests?cnpj={cnpj}",
+    "instagram-followers": lambda cnpj, name: f"/instagram-followers?company_name={name}",
+    "facebook-followers": lambda cnpj, name: f"/facebook-followers?company_name={name}",
+    "company-data": lambda cnpj, name: f"/company-data?cnpj={cnpj}",
+}
+BROWSER_ROUTES = {"protests", "instagram-followers", "facebook-followers", "company-data"}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the service against local stand-in upstreams.")
+    parser.add_argument("--targets", default="company-data,routes,batch",
+                        help="Comma-separated targets: company-data, routes and batch (default: all).")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="Comma-separated routes measured by the 'routes' target.")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="Skip the targets and routes that need a browser.")
+    parser.add_argument("--requests", type=int, default=50, help="Calls per target or route (default: 50).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent calls (default: 4).")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latency of the stand-in upstreams (default: 50).")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency of the stand-ins (default: 0).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the generated CNPJs.")
+    parser.add_argument("--output", default=None, help="Write the results to a JSON file.")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Tolerated p95 increase or throughput drop against the baseline (default: 0.2).")
+    return parser.parse_args()
+
+def generate_cnpjs(count, seed=42):
+    """Generate distinct CNPJs with valid check digits."""
+    rng = random.Random(seed)
+    bases = rng.sample(range(10_000_000, 99_999_999), count)
+    cnpjs = []
+    for base in bases:
+        digits = [int(d) for d in f"{base:08d}0001"]
+        for position in (12, 13):
+            weights = list(range(position - 7, 1, -1)) + list(range(9, 1, -1))
+            remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+            digits.append(0 if remainder < 2 else 11 - remainder)
+        cnpjs.append("".join(map(str, digits)))
+    return cnpjs
+
+def summarize(latencies, errors, elapsed):
+    """Latency percentiles, in seconds, and calls completed per second."""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (np.nan, np.nan, np.nan)
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "throughput": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+    }
+
+def measure(func, items, concurrency):
+    """
+    Call func on every item with the given concurrency.
+
+    func returns whether the call succeeded; exceptions count as errors.
+    """
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def timed(item):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = func(item)
+        except Exception as e:
+            print(f"Error on {item}: {e}")
+            ok = False
+        duration = time.perf_counter() - start
+        with lock:
+            latencies.append(duration)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, items))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def bench_company_data(cnpjs, concurrency):
+    from app.service import fetch_company_data
+    return measure(lambda cnpj: "error" not in fetch_company_data(cnpj), cnpjs, concurrency)
+
+def bench_routes(routes, cnpjs, concurrency):
+    from app import app as flask_app
+
+    clients = threading.local()
+
+    def call(path):
+        if not hasattr(clients, "client"):
+            clients.client = flask_app.test_client()
+        response = clients.client.get(path)
+        response.close()
+        return response.status_code < 500
+
+    results = {}
+    for route in routes:
+        # Distinct names, so concurrent calls are not coalesced
+        paths = [ROUTES[route](cnpj, f"exemplo-alimentos-{cnpj[:8]}") for cnpj in cnpjs]
+        results[f"route {route}"] = measure(call, paths, concurrency)
+    return results
+
+def bench_batch(cnpjs, concurrency, work_dir):
+    import main as batch_main
+
+    input_file = os.path.join(work_dir, "base_cnpj.csv")
+    with open(input_file, "w", encoding="latin1") as file:
+        file.write("CNPJ\n" + "\n".join(cnpjs) + "\n")
+    output_dir = tempfile.mkdtemp(dir=work_dir)
+
+    # Time each CNPJ of the loop
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    fetch = batch_main.fetch_company_data
+
+    def timed_fetch(cnpj):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            result = fetch(cnpj)
+        except Exception:
+            with lock:
+                errors += 1
+            raise
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            errors += 1 if "error" in result else 0
+        return result
+
+    batch_main.fetch_company_data = timed_fetch
+    try:
+        start = time.perf_counter()
+        batch_main.main(["--input", input_file, "--output-dir", output_dir, "--workers", str(concurrency), "--no-export"])
+        elapsed = time.perf_counter() - start
+    finally:
+        batch_main.fetch_company_data = fetch
+    return summarize(latencies, errors, elapsed)
+
+def print_report(results, args):
+    print()
+    print(f"Concurrency {args.concurrency}, {args.requests} calls per target, upstream latency {args.latency_ms:.0f} ms")
+    print(f"{'target':<32}{'calls':>7}{'errors':>8}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}{'CNPJs/s':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<32}{result['calls']:>7}{result['errors']:>8}{result['p50']:>10.3f}"
+            f"{result['p95']:>10.3f}{result['p99']:>10.3f}{result['throughput']:>10.2f}"
+        )
+
+def compare(results, baseline, max_regression):
+    """Return the targets that regressed against the baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result["p95"] > previous["p95"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95']:.3f}s -> {result['p95']:.3f}s")
+        if result["throughput"] < previous["throughput"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {previous['throughput']:.2f} -> {result['throughput']:.2f} CNPJs/s")
+    return regressions
+
+def main():
+    args = parse_args()
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    if args.no_browser:
+        targets = [target for target in targets if target == "routes"]
+        routes = [route for route in routes if route not in BROWSER_ROUTES]
+
+    upstreams = start_upstreams(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000)
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    cookies_file = os.path.join(work_dir, "instagram_cookies.pkl")
+    with open(cookies_file, "wb") as file:
+        pickle.dump([], file)
+
+    # The service reads its settings at import time, so they are set first.
+    # Caches are off and local state goes to a scratch directory.
+    os.environ.update(upstream_environment(upstreams))
+    os.environ.update({
+        "RESULT_CACHE": "0",
+        "HANDLE_INDEX": "0",
+        "REGISTRY_BACKEND": "receitaws",
+        "INSTAGRAM_COOKIES_FILE": cookies_file,
+        "JOBS_DB_FILE": os.path.join(work_dir, "jobs.sqlite3"),
+        "PESQUISAPROTESTO_SESSION_FILE": os.path.join(work_dir, "pesquisaprotesto_session.pkl"),
+        "WARM_UP_BROWSERS": "0",
+        "PESQUISAPROTESTO_SESSION_REFRESH_INTERVAL": "0",
+    })
+    os.environ.setdefault("PESQUISAPROTESTO_DELAY_BUDGET", "0")
+    os.environ.setdefault("PORTAL_TRANSPARENCIA_API_KEY", "benchmark")
+
+    cnpjs = generate_cnpjs(args.requests, args.seed)
+    results = {}
+    try:
+        if "company-data" in targets:
+            results["fetch_company_data"] = bench_company_data(cnpjs, args.concurrency)
+        if "routes" in targets:
+            results.update(bench_routes(routes, cnpjs, args.concurrency))
+        if "batch" in targets:
+            # Fresh CNPJs, so the batch does not resume from the other targets
+            results["main.py batch"] = bench_batch(generate_cnpjs(args.requests, args.seed + 1), args.concurrency, work_dir)
+    finally:
+        for upstream in upstreams.values():
+            upstream.stop()
+
+    print_report(results, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            print("\nPerformance regressions against the baseline:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\nNo regression against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Local stand-ins of the upstream services, replaying the fixtures in benchmarks/fixtures.
+
+Each service runs its own HTTP server on a free local port. '{cnpj}' and
+'{slug}' in the fixtures are replaced by the values of the request, and an
+optional delay emulates the upstream latency.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+class Upstream:
+    """
+    A stand-in service: an ordered list of (path pattern, handler) routes.
+
+    A handler receives the match and the parsed query string, and returns a
+    (status, content type, body) tuple.
+    """
+
+    def __init__(self, name, routes, latency=0.0, jitter=0.0):
+        self.name = name
+        self.routes = [(re.compile(pattern), handler) for pattern, handler in routes]
+        self.latency = latency
+        self.jitter = jitter
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                for pattern, handler in upstream.routes:
+                    match = pattern.fullmatch(parsed.path)
+                    if match:
+                        status, content_type, body = handler(match, parse_qs(parsed.query))
+                        break
+                else:
+                    status, content_type, body = 404, "text/plain", "Not found"
+
+                delay = upstream.latency + random.uniform(0, upstream.jitter)
+                if delay:
+                    time.sleep(delay)
+
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name=f"upstream-{self.name}").start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+def _template(name, content_type, status=200):
+    """Handler serving a fixture, filled with the 'cnpj' and 'slug' groups of the route."""
+    body = read_fixture(name)
+
+    def handler(match, query):
+        values = {**{key: value[0] for key, value in query.items()}, **match.groupdict()}
+        text = body
+        for key in ("cnpj", "slug"):
+            text = text.replace("{" + key + "}", values.get(key) or values.get("cpfCnpj") or values.get("documento") or "")
+        return status, content_type, text
+    return handler
+
+def _protests(protest_rate):
+    """Handler of the protest search API: a share of the CNPJs has protests."""
+    with_protests = _template("pesquisaprotesto_consulta.json", "application/json")
+
+    def handler(match, query):
+        cnpj = query.get("documento", [""])[0]
+        if cnpj and int(cnpj) % 100 < protest_rate * 100:
+            return with_protests(match, query)
+        return 200, "application/json", f'{{"documento": "{cnpj}", "cartorios": []}}'
+    return handler
+
+def start_upstreams(latency=0.0, jitter=0.0, protest_rate=0.3):
+    """
+    Start a stand-in for every upstream service.
+
+    Args:
+        latency (float): Fixed delay added to each response, in seconds.
+        jitter (float): Maximum random delay added on top of the latency, in seconds.
+        protest_rate (float): Share of the CNPJs reported with protests.
+
+    Returns:
+        dict: The running Upstream of each service, by name.
+    """
+    upstreams = {
+        "receitaws": Upstream("receitaws", [
+            (r"/v1/cnpj/(?P<cnpj>\d+)", _template("receitaws.json", "application/json")),
+        ], latency, jitter),
+        "transparencia": Upstream("transparencia", [
+            (r"/api-de-dados/contratos/cpf-cnpj", _template("transparencia.json", "application/json")),
+        ], latency, jitter),
+        "reclameaqui": Upstream("reclameaqui", [
+            (r"/empresa/(?P<slug>[^/]+)/?", _template("reclameaqui.html", "text/html")),
+        ], latency, jitter),
+        "pesquisaprotesto": Upstream("pesquisaprotesto", [
+            (r"/servico/consulta-documento", _template("pesquisaprotesto.html", "text/html")),
+            (r"/api/consulta", _protests(protest_rate)),
+        ], latency, jitter),
+        "instagram": Upstream("instagram", [
+            (r"/", lambda match, query: (200, "text/html", "<html><body></body></html>")),
+            (r"/(?P<slug>[^/]+)/?", _template("instagram.html", "text/html")),
+        ], latency, jitter),
+        "facebook": Upstream("facebook", [
+            (r"/(?P<slug>[^/]+)/?", _template("facebook.html", "text/html")),
+        ], latency, jitter),
+    }
+    for upstream in upstreams.values():
+        upstream.start()
+    return upstreams
+
+def upstream_environment(upstreams):
+    """Environment variables pointing the service at the stand-ins."""
+    return {
+        "RECEITAWS_URL": f"{upstreams['receitaws'].url}/v1/cnpj",
+        "PORTAL_TRANSPARENCIA_URL": f"{upstreams['transparencia'].url}/api-de-dados",
+        "RECLAMEAQUI_URL": f"{upstreams['reclameaqui'].url}/empresa",
+        "PESQUISAPROTESTO_URL": upstreams["pesquisaprotesto"].url,
+        "INSTAGRAM_URL": upstreams["instagram"].url,
+        "FACEBOOK_URL": upstreams["facebook"].url,
+    }
@@ -1,54 +1,138 @@
+import argparse
 import os
 import random
 import pandas as pd
 from tqdm import tqdm
-from app.service import fetch_company_data
+from app.batch import iter_batch
+from app.checkpoint import CheckpointStore, read_results
+from app.cnpj_reader import iter_cnpjs
+from app.service import configure_lanes, fetch_company_data
+from app.utils import normalize_cnpj
 
-def main():
-    # File path and sheet name
-    file_path = 'app/data/base_cnpj.csv'
-    results_file = 'app/data/resultados_cnpjs.xlsx'
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch company data for every CNPJ in the input file.")
+    parser.add_argument(
+        "--workers", "--concurrency",
+        dest="workers",
+        type=int,
+        default=4,
+        help="Number of CNPJs processed concurrently (default: 4).",
+    )
+    parser.add_argument(
+        "--http-workers",
+        type=int,
+        default=None,
+        help="Threads for the HTTP-only sources (default: SOURCE_WORKERS).",
+    )
+    parser.add_argument(
+        "--browser-workers",
+        type=int,
+        default=None,
+        help="Threads for the browser-backed sources (default: the total size of the driver pools of the profiles in use).",
+    )
+    parser.add_argument(
+        "--input",
+        default="app/data/base_cnpj.csv",
+        help="CSV file with a 'CNPJ' column (default: app/data/base_cnpj.csv).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="app/data",
+        help="Directory of the checkpoint and the exported results (default: app/data).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read the input file in chunks, validating and deduplicating CNPJs as they are read.",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=100000,
+        help="Rows read per chunk in streaming mode (default: 100000).",
+    )
+    parser.add_argument(
+        "--no-export",
+        action="store_true",
+        help="Skip the final export and keep only the checkpoint file.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["xlsx", "parquet"],
+        default="xlsx",
+        help="Format of the exported results: Excel, or typed columnar Parquet (default: xlsx).",
+    )
+    return parser.parse_args(argv)
 
-    # Read the CSV file
-    df = pd.read_csv(file_path, sep=';', encoding='latin1', dtype=str)
+def main(argv=None):
+    args = parse_args(argv)
+    configure_lanes(http_workers=args.http_workers, browser_workers=args.browser_workers)
 
-    # Convert the 'CNPJ' column to a list
-    cnpj_list = df['CNPJ'].tolist()
+    # File paths
+    file_path = args.input
+    checkpoint_file = os.path.join(args.output_dir, 'resultados_cnpjs.jsonl')
+    results_file = os.path.join(args.output_dir, f'resultados_cnpjs.{args.output_format}')
 
-    # Load existing results to continue from where it stopped
-    if os.path.exists(results_file):
-        results_df = pd.read_excel(results_file, dtype={'cnpj': str})
-        processed = set(results_df['cnpj'].astype(str))
+    # Results are appended to the checkpoint as they complete; seed it from
+    # the results of a previous run saved only to Excel
+    checkpoint = CheckpointStore(checkpoint_file)
+    if args.output_format == 'xlsx' and not checkpoint.exists() and os.path.exists(results_file):
+        previous_df = pd.read_excel(results_file, dtype={'cnpj': str})
+        previous_df['cnpj'] = previous_df['cnpj'].map(normalize_cnpj)
+        checkpoint.extend(previous_df.to_dict('records'))
+
+    # Load the processed CNPJs to continue from where it stopped
+    processed = checkpoint.processed_keys()
+    if args.output_format == 'parquet' and os.path.exists(results_file):
+        # The Parquet export keeps the results of every run; only its CNPJ column is read
+        processed |= set(read_results(results_file, columns=['cnpj'])['cnpj'])
+    # Results are saved under the normalized CNPJ; older checkpoints may hold
+    # the CNPJs as they were written in the input file
+    processed = {normalize_cnpj(key) for key in processed}
+
+    if args.stream:
+        # Feed the batch lazily, in a buffered random order
+        remaining_cnpjs = iter_cnpjs(file_path, chunksize=args.chunksize, skip=processed)
+        total = None
     else:
-        results_df = pd.DataFrame()
-        processed = set()
+        # Read the CSV file
+        df = pd.read_csv(file_path, sep=';', encoding='latin1', dtype=str)
+
+        # Convert the 'CNPJ' column to a list
+        cnpj_list = df['CNPJ'].tolist()
 
-    # Filter unprocessed CNPJs
-    remaining_cnpjs = [cnpj for cnpj in cnpj_list if str(cnpj) not in processed]
+        # Filter unprocessed CNPJs, comparing them in their normalized form
+        cnpj_list = list(dict.fromkeys(normalize_cnpj(cnpj) for cnpj in cnpj_list))
+        remaining_cnpjs = [cnpj for cnpj in cnpj_list if cnpj not in processed]
 
-    # Shuffle the remaining CNPJs
-    random.shuffle(remaining_cnpjs)
+        # Shuffle the remaining CNPJs
+        random.shuffle(remaining_cnpjs)
+        total = len(remaining_cnpjs)
 
-    # Process CNPJs
-    for cnpj in tqdm(remaining_cnpjs, desc="Processing CNPJs"):
+    # Process CNPJs concurrently, saving each result as it completes
+    batch = iter_batch(fetch_company_data, remaining_cnpjs, workers=args.workers)
+    for cnpj, result, error in tqdm(batch, total=total, desc="Processing CNPJs"):
         try:
-            # Fetch company data
-            result = fetch_company_data(cnpj)
-            
-            # Convert the result to a DataFrame if valid
-            if result:
-                new_df = pd.DataFrame([result])
-                results_df = pd.concat([results_df, new_df], ignore_index=True)
-            
-            # Ensure 'cnpj' column is a string
-            results_df['cnpj'] = results_df['cnpj'].astype(str)
-            
-            # Save updated results
-            results_df.to_excel(results_file, index=False)
+            if error:
+                raise error
+
+            # Save the result if valid
+            if result and "error" not in result:
+                checkpoint.append(result)
         except Exception as e:
             print(f"Error processing CNPJ {cnpj}: {e}")
 
+    checkpoint.close()
+
+    # Export the results once, at the end of the run
+    if not args.no_export:
+        if args.output_format == 'parquet':
+            rows = checkpoint.export_parquet(results_file)
+        else:
+            rows = checkpoint.export_excel(results_file)
+        print(f"{rows} results exported to {results_file}.")
+
     print("Processing completed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
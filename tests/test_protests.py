@@ -0,0 +1,75 @@
+import json
+import os
+import pytest
+from app.service import _parse_amount, _sum_protests, extract_protests_bulk
+
+FIXTURE = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures", "pesquisaprotesto_consulta.json")
+SEARCH_URL = "https://api.pesquisaprotesto.com.br/api/consulta?documento=11222333000181"
+
+def load_fixture():
+    with open(FIXTURE, encoding="utf-8") as file:
+        return json.loads(file.read().replace("{cnpj}", "11222333000181"))
+
+def sum_protests(payload):
+    totals = {"count": 0, "value": 0.0, "found": False}
+    _sum_protests(payload, totals)
+    return totals
+
+class CapturingDriver:
+    """A driver whose performance log holds the given (url, body) responses."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get_log(self, log_type):
+        return [
+            {"message": json.dumps({"message": {
+                "method": "Network.responseReceived",
+                "params": {"requestId": str(index), "response": {"url": url, "mimeType": "application/json"}},
+            }})}
+            for index, (url, _) in enumerate(self.responses)
+        ]
+
+    def execute_cdp_cmd(self, command, params):
+        return {"body": json.dumps(self.responses[int(params["requestId"])][1])}
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.234,56", 1234.56),
+    ("R$ 480,50", 480.5),
+    ("1.250", 1250.0),
+    ("1.250.000", 1250000.0),
+    ("300", 300.0),
+    (12.5, 12.5),
+    (7, 7.0),
+    ("", 0.0),
+])
+def test_parse_amount(value, expected):
+    assert _parse_amount(value) == expected
+
+def test_sum_protests_of_the_fixture():
+    totals = sum_protests(load_fixture())
+    assert (totals["count"], totals["value"], totals["found"]) == (3, 4830.5, True)
+
+def test_sum_protests_ignores_totals_over_nested_figures():
+    payload = {
+        "qtdTitulos": 3,
+        "valorProtestado": "4.100,00",
+        "cartorios": [
+            {"qtdTitulos": 1, "valorProtestado": "1.000,00"},
+            {"qtdTitulos": 2, "titulos": [{"valorProtestado": "1.250"}, {"valorProtestado": 1850}]},
+        ],
+    }
+    totals = sum_protests(payload)
+    assert (totals["count"], totals["value"]) == (3, 4100.0)
+
+def test_sum_protests_without_protests():
+    assert sum_protests({"documento": "11222333000181", "cartorios": []})["found"] is False
+
+def test_bulk_extraction_counts_a_resubmitted_search_once():
+    payload = load_fixture()
+    driver = CapturingDriver([(SEARCH_URL, payload), (SEARCH_URL, payload)])
+    assert extract_protests_bulk(driver) == (3, 4830.5)
+
+def test_bulk_extraction_without_details():
+    driver = CapturingDriver([(SEARCH_URL, {"documento": "11222333000181", "cartorios": []})])
+    assert extract_protests_bulk(driver) is None
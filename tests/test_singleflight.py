@@ -0,0 +1,98 @@
+import threading
+from app.singleflight import single_flight
+from app.utils import normalize_cnpj
+
+def run_concurrently(func, values):
+    """Call func on every value from its own thread, all started together, and return the results in order."""
+    results = [None] * len(values)
+    start = threading.Barrier(len(values))
+
+    def call(index, value):
+        start.wait()
+        try:
+            results[index] = func(value)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index, value)) for index, value in enumerate(values)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_identical_calls_share_one_run():
+    calls = []
+    release = threading.Event()
+
+    @single_flight("test")
+    def fetch(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    assert run_concurrently(fetch, [21, 21, 21]) == [42, 42, 42]
+    assert calls == [21]
+
+def test_differently_formatted_keys_get_a_result_valid_for_their_input():
+    calls = []
+    entered = threading.Event()
+    release = threading.Event()
+
+    @single_flight("test", key=normalize_cnpj)
+    def fetch(cnpj):
+        calls.append(cnpj)
+        entered.set()
+        release.wait(5)
+        # Like the registry API, only digits are accepted
+        if not cnpj.isdigit():
+            return {"error": "Unable to fetch CNPJ data: 404"}
+        return {"cnpj": cnpj}
+
+    results = {}
+    # The formatted CNPJ leads the flight, and the clean one joins it
+    leader = threading.Thread(target=lambda: results.update(leader=fetch("11.222.333/0001-81")))
+    leader.start()
+    assert entered.wait(5)
+    follower = threading.Thread(target=lambda: results.update(follower=fetch("11222333000181")))
+    follower.start()
+    threading.Timer(0.2, release.set).start()
+    leader.join()
+    follower.join()
+
+    assert results == {"leader": {"cnpj": "11222333000181"}, "follower": {"cnpj": "11222333000181"}}
+    assert calls == ["11222333000181"]
+
+def test_exception_is_raised_to_every_caller():
+    release = threading.Event()
+
+    @single_flight("test")
+    def fetch(value):
+        release.wait(5)
+        raise ValueError(value)
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results = run_concurrently(fetch, ["a", "a"])
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_nothing_is_kept_after_the_call():
+    calls = []
+
+    @single_flight("test")
+    def fetch(value):
+        calls.append(value)
+        return len(calls)
+
+    assert fetch("a") == 1
+    assert fetch("a") == 2
+
+def test_different_arguments_run_separately():
+    @single_flight("test")
+    def fetch(value, refresh=False):
+        return (value, refresh)
+
+    assert fetch("a") == ("a", False)
+    assert fetch("a", refresh=True) == ("a", True)